@@ -1,22 +1,24 @@
 import datetime
 import logging
+import traceback
 import warnings
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import pandas as pd
-from html_table_generator import generate_html_table, main as get_language
-from aladdin_average_generator import main as process_aladdin_data
-
-# Get language from command line or user input
-input_language = get_language()
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("logs/data_preper.log"), logging.StreamHandler()],
+from aladdin_average_generator import (
+    EXCEL_OUTPUT_FORMATS,
+    OUTPUT_FORMATS,
+    format_percentages,
+    load_store,
+    main as process_aladdin_data,
+    store_is_complete,
 )
+from bbdd_snapshot import load_bbdd
+from derived_metrics import derive_metrics
+from processed_data_store import save_processed_store, save_table_records
+
 # Suppress the specific warning
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 
@@ -30,129 +32,177 @@ output_path = base_path / "final_processed_data"
 aladdin_processed_path = input_path / "aladdin_data" / "aladdin_data_processed"
 bbdd_file = input_path / "bbdd_sfdr_wip.xlsx"
 
-# Create output directory if it doesn't exist
-output_path.mkdir(parents=True, exist_ok=True)
+# Columns holding the tables of a fund, saved to a side file per fund and
+# translated and rendered by the report builder
+TABLE_COLUMNS = ["q03_t1", "q04_t"]
 
-# Read Auxiliary data to all the funds, the BBDD file
-bbdd = pd.read_excel(bbdd_file)
-bbdd.rename(
-    columns={"aladdin_code": "security_description"}, inplace=True
-)  # Rename column to match the other dataframes
 
+def load_processed_excel(file_path):
+    """Load the header row, data row and tables of an average_output_*.xlsx"""
+    # Read the Post-Contractual Info Data sheet
+    df = pd.read_excel(file_path, sheet_name="Post-Contractual Info Data", header=None)
+    # Check if the DataFrame has at least 5 rows
+    if df.shape[0] < 2:
+        raise ValueError(f"File {file_path} has fewer than 2 rows")
 
-# Define function to process the Aladdin data averaged and generate HTML tables
-def read_processed_aladdin_files():
-    """Read all processed Aladdin files from the processed directory"""
-    logging.info(f"Reading processed Aladdin files from {aladdin_processed_path}")
+    # Get the header row (row 4, index 3)
+    headers = df.iloc[0]
 
-    all_data = []
-    processed_files = list(aladdin_processed_path.glob("average_output_*.xlsx"))
+    # Get the data row (row 2, index 4)
+    data = df.iloc[1]
 
-    if not processed_files:
-        logging.error(f"No processed files found in {aladdin_processed_path}")
-        return None
+    sector_df = pd.read_excel(file_path, sheet_name="Sectorial Distribution")
+    investment_df = pd.read_excel(file_path, sheet_name="Top Investments")
 
-    for file_path in processed_files:
-        try:
-            logging.info(f"Processing file: {file_path}")
-            # Read the Post-Contractual Info Data sheet
-            df = pd.read_excel(
-                file_path, sheet_name="Post-Contractual Info Data", header=None
-            )
-            # Check if the DataFrame has at least 5 rows
-            if df.shape[0] < 2:
-                logging.error(f"File {file_path} has fewer than 2 rows. Skipping.")
-                continue
-
-            # Get the header row (row 4, index 3)
-            headers = df.iloc[0]
-
-            # Get the data row (row 2, index 4)
-            data = df.iloc[1]
-
-            # Create a new DataFrame with proper headers
-            processed_df = pd.DataFrame([data.values], columns=headers)
-
-            # Debug log
-            logging.info(f"Processing {file_path.name}")
-
-            # Convert numeric columns
-            numeric_columns = [
-                "{{es_aligned}}",
-                "{{sust_invest}}",
-                "{{sust_invest_env}}",
-                "{{sust_invest_soc}}",
-            ]
-
-            for col in numeric_columns:
-                if col in processed_df.columns:
-                    processed_df[col] = pd.to_numeric(
-                        processed_df[col], errors="coerce"
-                    )
-
-            # Generate HTML tables
-            sector_df = pd.read_excel(file_path, sheet_name="Sectorial Distribution")
-            investment_df = pd.read_excel(file_path, sheet_name="Top Investments")
-
-            # Convert float columns to string with one decimal place before passing to generate_html_table
-            for df in [sector_df, investment_df]:
-                numeric_cols = df.select_dtypes(include=["float64"]).columns
-                for col in numeric_cols:
-                    df[col] = df[col].apply(
-                        lambda x: f"{float(x):.1f}" if pd.notnull(x) else ""
-                    )
-
-            processed_df["q03_t1"] = generate_html_table(
-                investment_df, "investment", input_language
-            )
-            processed_df["q04_t"] = generate_html_table(
-                sector_df, "sector", input_language
+    return headers, data, sector_df, investment_df
+
+
+def load_results_tables(post_contractual, sectorial, top_investments):
+    """Unpack the averaged frames of a fund returned by process_aladdin_data"""
+    # Rows 3 and 4 hold the headers and the averaged values
+    headers = post_contractual.loc[3]
+    data = post_contractual.loc[4]
+
+    # Format the percentages exactly as the Excel copy shows them
+    if not sectorial.empty:
+        sectorial = sectorial.reset_index()
+    sector_df = format_percentages(sectorial)
+    investment_df = format_percentages(top_investments)
+
+    return headers, data, sector_df, investment_df
+
+
+def load_processed_store(store_dir):
+    """Load the header row, data row and tables of a typed average_output_* store"""
+    return load_results_tables(*load_store(store_dir))
+
+
+def build_processed_frame(headers, data, sector_df, investment_df):
+    """Build the row of one fund, with its investment and sector tables
+
+    The tables are kept as DataFrames in the q03_t1 and q04_t cells, with
+    their values formatted for the report but not translated.
+    """
+    # Create a new DataFrame with proper headers
+    processed_df = pd.DataFrame([data.values], columns=headers)
+
+    # Convert numeric columns
+    numeric_columns = [
+        "{{es_aligned}}",
+        "{{sust_invest}}",
+        "{{sust_invest_env}}",
+        "{{sust_invest_soc}}",
+    ]
+
+    for col in numeric_columns:
+        if col in processed_df.columns:
+            processed_df[col] = pd.to_numeric(processed_df[col], errors="coerce")
+
+    # Convert float columns to string with one decimal place for the report
+    for df in [sector_df, investment_df]:
+        numeric_cols = df.select_dtypes(include=["float64"]).columns
+        for col in numeric_cols:
+            df[col] = df[col].apply(
+                lambda x: f"{float(x):.1f}" if pd.notnull(x) else ""
             )
 
-            all_data.append(processed_df)
+    # Keep the tables as data, one DataFrame per cell
+    processed_df["q03_t1"] = [investment_df]
+    processed_df["q04_t"] = [sector_df]
+
+    return processed_df
+
+
+def load_fund_tables(source):
+    """Load the tables of a fund from averaged frames, a typed store or an Excel copy"""
+    if isinstance(source, tuple):
+        return load_results_tables(*source)
+    if source.is_dir():
+        return load_processed_store(source)
+    return load_processed_excel(source)
 
-        except Exception as e:
-            logging.error(f"Error processing file {file_path}: {str(e)}")
-            logging.error("Full traceback:", exc_info=True)
-            continue
+
+def build_fund_row(source):
+    """Build the row of one fund, returning the traceback of any error instead"""
+    try:
+        return build_processed_frame(*load_fund_tables(source)), None
+    except Exception:
+        return None, traceback.format_exc()
+
+
+def build_fund_rows(sources, workers=1):
+    """Build the rows of several funds and combine them in the order of sources
+
+    sources maps a fund name to what load_fund_tables reads. With workers > 1
+    the funds are built in a process pool. Returns the combined DataFrame, or
+    None if no fund could be built, and the errors keyed by fund name.
+    """
+    names = list(sources)
+    if workers > 1 and len(names) > 1:
+        logging.info(f"Building {len(names)} funds on {workers} workers")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            built = list(pool.map(build_fund_row, [sources[name] for name in names]))
+    else:
+        built = [build_fund_row(sources[name]) for name in names]
+
+    all_data = []
+    errors = {}
+    for name, (processed_df, error) in zip(names, built):
+        if error is not None:
+            logging.error(f"Error processing {name}:\n{error}")
+            errors[name] = error
+        else:
+            logging.info(f"Processed {name}")
+            all_data.append(processed_df)
 
     if not all_data:
-        return None
+        return None, errors
 
     # Combine all processed data
     final_df = pd.concat(all_data, ignore_index=True)
-    logging.info(f"Combined {len(all_data)} processed files")
+    logging.info(f"Combined {len(all_data)} processed funds")
 
-    return final_df
+    return final_df, errors
 
 
-def round_numeric_columns(df):
-    # Get all numeric columns
-    numeric_columns = df.select_dtypes(include=["float64", "int64"]).columns
+def process_aladdin_results(aladdin_results, workers=1):
+    """Build the fund rows straight from the frames returned by process_aladdin_data
 
-    # Round all numeric columns to 2 decimal places
-    for col in numeric_columns:
-        df[col] = df[col].round(2)
+    Returns the combined DataFrame (None if empty) and the errors by prefix.
+    """
+    logging.info(f"Using the averaged Aladdin data of {len(aladdin_results)} funds")
 
-    return df
+    sources = {prefix: aladdin_results[prefix] for prefix in sorted(aladdin_results)}
+    return build_fund_rows(sources, workers)
 
 
-def transform_esg_score(average_score: float) -> str:
-    """Transform the average ESG score based on defined conditions."""
-    logging.debug(f"Transforming score: {average_score}")
-    average_score = float(average_score)
-    try:
-        if average_score > 80:
-            return "A+"
-        elif 65 < average_score <= 80:
-            return "A"
-        elif 55 < average_score <= 65:
-            return "A-"
-        else:
-            return "B"  # Assign a default grade for scores <= 55
-    except Exception as e:
-        logging.error(f"Error transforming ESG score: {str(e)}")
-        return "B"  # Assign a default grade for any errors
+# Define function to process the Aladdin data averaged and generate HTML tables
+def read_processed_aladdin_files(workers=1):
+    """Read all processed Aladdin files from the processed directory
+
+    The typed Parquet store of a fund is used when it is complete; the Excel
+    copy is only read for funds without one. Returns the combined DataFrame
+    (None if empty) and the errors by file name.
+    """
+    logging.info(f"Reading processed Aladdin files from {aladdin_processed_path}")
+
+    processed_files = {
+        path.stem: path for path in aladdin_processed_path.glob("average_output_*.xlsx")
+    }
+    processed_files.update(
+        {
+            path.name: path
+            for path in aladdin_processed_path.glob("average_output_*")
+            if path.is_dir() and store_is_complete(path)
+        }
+    )
+
+    if not processed_files:
+        logging.error(f"No processed files found in {aladdin_processed_path}")
+        return None, {}
+
+    sources = {name: processed_files[name] for name in sorted(processed_files)}
+    return build_fund_rows(sources, workers)
 
 
 def sort_columns(df):
@@ -175,9 +225,7 @@ def sort_columns(df):
     columns_without_braces = [
         col
         for col in all_columns
-        if "{{" not in col
-        and col not in first_columns
-        and col not in ["q03_t1", "q04_t"]
+        if "{{" not in col and col not in first_columns and col not in TABLE_COLUMNS
     ]
 
     # Sort the separated columns
@@ -186,10 +234,7 @@ def sort_columns(df):
 
     # Combine all columns in the desired order
     final_column_order = (
-        first_columns
-        + columns_with_braces
-        + columns_without_braces
-        + ["q03_t1", "q04_t"]
+        first_columns + columns_with_braces + columns_without_braces + TABLE_COLUMNS
     )
 
     # Reorder the dataframe
@@ -198,67 +243,131 @@ def sort_columns(df):
     return df_sorted
 
 
-if __name__ == "__main__":
-    # First, run the aladdin_average_generator script
-    logging.info("Running aladdin_average_generator...")
-    try:
-        aladdin_results = process_aladdin_data()
-        if aladdin_results is None:
-            logging.error("Failed to process Aladdin data. Exiting.")
-            sys.exit(1)
-        logging.info("Aladdin average generation completed successfully.")
-    except Exception as e:
-        logging.error(f"Error running aladdin_average_generator: {str(e)}")
-        logging.error("Full traceback:", exc_info=True)
-        sys.exit(1)
+def finalize_processed_data(result_df):
+    """Merge the BBDD into the fund rows and add the derived report columns"""
+    # Merge the BBDD, read from its cached snapshot unless the file changed
+    bbdd = load_bbdd(bbdd_file).merge_table()
+    result_df = pd.merge(result_df, bbdd, on="security_description", how="left")
 
-    # Read the processed Aladdin files
-    result_df = read_processed_aladdin_files()
-
-    if result_df is not None:
-        # Read and merge BBDD file
-        bbdd = pd.read_excel(bbdd_file)
-        bbdd.rename(columns={"aladdin_code": "security_description"}, inplace=True)
-        result_df = pd.merge(result_df, bbdd, on="security_description", how="left")
-
-        # Multiply percentage columns by 100
-        columns_to_multiply = [
-            "{{es_aligned}}",
-            "{{sust_invest}}",
-            "{{sust_invest_env}}",
-            "{{sust_invest_soc}}",
-        ]
-        result_df[columns_to_multiply] *= 100
-
-        # Calculate new columns
-        result_df["{{other_nones}}"] = 100 - result_df["{{es_aligned}}"]
-        result_df["{{other_non_sust}}"] = (
-            result_df["{{es_aligned}}"] - result_df["{{sust_invest}}"]
-        )
-
-        # Calculate 'rest_' columns
-        aligned_columns = ["capex", "opex", "turnover"]
-        for col in aligned_columns:
-            result_df[f"rest_{col}_aligned"] = 100 - result_df[f"total_{col}_aligned"]
-            result_df[f"rest_{col}_aligned_exsovereign"] = (
-                100 - result_df[f"total_{col}_aligned_exsovereign"]
-            )
+    # Add the derived metrics and the ESG grade, and round the numbers
+    result_df = derive_metrics(result_df)
+
+    # Sort columns
+    return sort_columns(result_df)
+
+
+def save_tables(result_df, tables_dir):
+    """Save the tables of each fund to tables_dir/{security_description}.json
+
+    Returns the frame with the tables replaced by a tables_file column, the
+    path of each side file relative to the final processed data folder.
+    """
+    tables_dir.mkdir(parents=True, exist_ok=True)
+    # Drop the side files of funds no longer in the data
+    for old_file in tables_dir.glob("*.json"):
+        old_file.unlink()
+
+    tables_files = []
+    for _, row in result_df.iterrows():
+        tables_file = tables_dir / f"{row['security_description']}.json"
+        save_table_records({col: row[col] for col in TABLE_COLUMNS}, tables_file)
+        tables_files.append(f"{tables_dir.name}/{tables_file.name}")
+
+    return result_df.drop(columns=TABLE_COLUMNS).assign(tables_file=tables_files)
 
-        # transform esg_score_2024 using transform_esg_score()
-        result_df["{{esg_score_2024}}"] = result_df["{{esg_score_2024}}"].apply(
-            transform_esg_score
-        )
 
-        # Round numeric values
-        result_df = round_numeric_columns(result_df)
+def save_processed_data(result_df, date=DATE, excel=False):
+    """Save the final DataFrame as {date}_final_processed_data.parquet
 
-        # Sort columns
-        result_df = sort_columns(result_df)
+    The tables of each fund go to a side file in {date}_final_processed_data_tables.
+    With excel, a copy for people to read is also saved as .xlsx, before the
+    Parquet store so that the report builder keeps reading the store unless the
+    copy is edited.
+    """
+    # Create output directory if it doesn't exist
+    output_path.mkdir(parents=True, exist_ok=True)
 
-        # Save the final DataFrame
-        output_file = output_path / f"{DATE}_final_processed_data.xlsx"
-        result_df.to_excel(output_file, index=False)
+    output_file = output_path / f"{date}_final_processed_data.parquet"
+    result_df = save_tables(result_df, output_path / f"{output_file.stem}_tables")
+    if excel:
+        excel_file = output_file.with_suffix(".xlsx")
+        result_df.to_excel(excel_file, index=False)
+        logging.info(f"Excel copy of the final processed data saved to: {excel_file}")
+    save_processed_store(result_df, output_file)
 
-        logging.info(f"Final processed data saved to: {output_file}")
+    logging.info(f"Final processed data saved to: {output_file}")
+    return output_file
+
+
+def prepare_processed_data(workers=1, resume=False, excel=False):
+    """Run data prep, from the Aladdin averaging to the final report columns
+
+    With resume the averaged outputs already on disk are read instead of
+    averaging again. With excel the averaging also writes the Excel copy of
+    each group. Returns the final DataFrame, or None if no fund could be
+    processed.
+    """
+    if resume:
+        # Read the processed Aladdin files of a previous run
+        logging.info("Resuming from the processed Aladdin files on disk")
+        result_df, errors = read_processed_aladdin_files(workers)
     else:
+        # First, run the aladdin_average_generator script
+        logging.info("Running aladdin_average_generator...")
+        try:
+            output_formats = EXCEL_OUTPUT_FORMATS if excel else OUTPUT_FORMATS
+            aladdin_results = process_aladdin_data(
+                workers=workers, output_formats=output_formats
+            )
+            if aladdin_results is None:
+                logging.error("Failed to process Aladdin data.")
+                return None
+            logging.info("Aladdin average generation completed successfully.")
+        except Exception as e:
+            logging.error(f"Error running aladdin_average_generator: {str(e)}")
+            logging.error("Full traceback:", exc_info=True)
+            return None
+
+        # Use the averaged frames directly instead of reading them back
+        result_df, errors = process_aladdin_results(aladdin_results, workers)
+
+    if errors:
+        logging.error(f"{len(errors)} fund(s) could not be processed: {sorted(errors)}")
+
+    if result_df is None:
         logging.error("Failed to process Excel files")
+        return None
+    return finalize_processed_data(result_df)
+
+
+if __name__ == "__main__":
+    # Set up logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.FileHandler("logs/data_preper.log"),
+            logging.StreamHandler(),
+        ],
+    )
+
+    # --resume skips the averaging step and reads its outputs from disk
+    resume = "--resume" in sys.argv[1:]
+
+    # --workers=N averages the groups and builds the fund tables in N processes
+    workers = next(
+        (
+            int(arg.split("=", 1)[1])
+            for arg in sys.argv[1:]
+            if arg.startswith("--workers=")
+        ),
+        1,
+    )
+
+    # --excel also saves the averages and the final data as Excel copies
+    excel = "--excel" in sys.argv[1:]
+
+    result_df = prepare_processed_data(workers, resume, excel)
+    if result_df is None:
+        sys.exit(1)
+    save_processed_data(result_df, excel=excel)
@@ -1,41 +1,16 @@
+import hashlib
+import json
 import logging
 import os
+import re
 import sys
 import warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import FrozenSet, List, Optional, Tuple, Union
 
 import pandas as pd
-from bs4 import BeautifulSoup
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("logs/template_builder.log"),
-        logging.StreamHandler(),
-    ],
-)
-
-# Check if languge code is provided as a command-line argument
-if len(sys.argv) > 1:
-    input_language = sys.argv[1]
-
-# ask input for language (es, en, pt, or  pl) assign to constant
-else:
-    try:
-        input_language = input("Enter the language code (es, en, pt, or pl): ")
-    except ValueError as e:
-        print(e)
-        logging.error(e)
-
-# Validate the input langugage
-if not isinstance(input_language, str) or input_language not in [
-    "es",
-    "en",
-    "pt",
-    "pl",
-]:
-    raise ValueError("Invalid language code. Please enter 'es', 'en', 'pt', or 'pl'.")
+from bs4 import BeautifulSoup, NavigableString
 
 # Suppress the specific warning
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
@@ -46,24 +21,21 @@ base_dir = r"C:\Users\n740789\Documents\sfdr_report_generator"
 # Set the output directory
 output_dir = os.path.join(base_dir, "narrative_templates")
 
-# Ensure the output directory exists
-os.makedirs(output_dir, exist_ok=True)
-
 # Set the path for the Excel file
 excel_file = os.path.join(base_dir, "excel_books", "narratives_tables.xlsx")
 
 # Set the path for the HTML template
 template_file = os.path.join(base_dir, "template.html")
 
-# Load the Excel file and choose the sheet = input_languge
-df = pd.read_excel(excel_file, sheet_name=input_language)
+# Languages of the narratives workbook, one sheet each
+LANGUAGES = ["es", "en", "pt", "pl"]
 
-# Load the HTML template
-with open(template_file, "r", encoding="utf-8") as file:
-    template_content = file.read()
+# Manifest of the inputs behind each narrative template, for incremental runs
+TEMPLATE_MANIFEST_FILE = "template_manifest.json"
+TEMPLATE_MANIFEST_VERSION = 1
 
-# List of the column names (after the first two columns)
-column_names = [
+# List of the column names (after the first two columns) filled in Spanish
+ES_COLUMN_NAMES = [
     "main_heading_text",
     "product_name",
     "lei_code",
@@ -96,113 +68,110 @@ column_names = [
     "q10sq04_a",
 ]
 
-# choose which columns to translate dependig on the
-if input_language == "es":
-    column_names = column_names
-else:
-    column_names = [
-        "main_heading_text",
-        "product_name",
-        "product_name_label",
-        "legal_id",
-        "lei_code",
-        "subheading",
-        "gb001_heading",
-        "gb002_heading",
-        "ob001_header_text",
-        "cb_art9_00_text",
-        "cb_art8_00_text",
-        "cb_art9_01_text",
-        "cb_art9_02_text",
-        "cb_art9_03_text",
-        "cb_art9_04_text",
-        "cb_art8_01_text",
-        "cb_art8_sost_text",
-        "cb_art8_02_text",
-        "cb_art8_03_text",
-        "cb_art8_04_text",
-        "sfdr_last_rep_inv_sust_inv",
-        "q01",
-        "q01_a",
-        "gb003_sq1a",
-        "gb004_sq1a",
-        "q01sq01",
-        "q01sq01_a",
-        "q01sq02",
-        "q01sq02_a",
-        "q01sq03",
-        "q01sq03_a",
-        "q01sq04",
-        "q01sq04_a",
-        "q01sq04sq01",
-        "q01sq04sq01_a",
-        "q01sq04sq02",
-        "q01sq04sq02_a",
-        "ob002",
-        "q02",
-        "q02_a",
-        "q03",
-        "gb005_q03",
-        "q03_a1",
-        "q03_a2",
-        "q03_t1",
-        "q04",
-        "q04_a",
-        "gb006_sq4a",
-        "q04sq01",
-        "q04sq01_a",
-        "n10000text",
-        "n11000text",
-        "n12000text",
-        "n11100text",
-        "n11200text",
-        "n11110text",
-        "n11120text",
-        "flowchart_legend_0",
-        "flowchart_legend_1",
-        "flowchart_legend_2",
-        "flowchart_legend_3",
-        "flowchart_legend_4",
-        "q04sq02",
-        "q04sq02_a",
-        "q04_t",
-        "q05",
-        "gb0078_q05",
-        "gb009_q05",
-        "q05_a",
-        "q05sq01",
-        "cb_q5_001_text",
-        "cb_q5_002_text",
-        "cb_q5_003_text",
-        "cb_q5_004_text",
-        "ob004",
-        "ob004b",
-        "q05_footnote",
-        "q05sq02",
-        "q05sq02_a",
-        "q05sq03",
-        "q05sq03_a",
-        "q06",
-        "gb010_q06",
-        "q06_a",
-        "q07",
-        "q07_a",
-        "q08",
-        "q08_a",
-        "q09",
-        "q09_a",
-        "q10",
-        "q10_a",
-        "gb011_sq10a",
-        "q10sq01",
-        "q10sq01_a",
-        "q10sq02",
-        "q10sq02_a",
-        "q10sq03",
-        "q10sq03_a",
-        "q10sq04",
-        "q10sq04_a",
-    ]
+# Columns filled in the other languages
+COLUMN_NAMES = [
+    "main_heading_text",
+    "product_name",
+    "product_name_label",
+    "legal_id",
+    "lei_code",
+    "subheading",
+    "gb001_heading",
+    "gb002_heading",
+    "ob001_header_text",
+    "cb_art9_00_text",
+    "cb_art8_00_text",
+    "cb_art9_01_text",
+    "cb_art9_02_text",
+    "cb_art9_03_text",
+    "cb_art9_04_text",
+    "cb_art8_01_text",
+    "cb_art8_sost_text",
+    "cb_art8_02_text",
+    "cb_art8_03_text",
+    "cb_art8_04_text",
+    "sfdr_last_rep_inv_sust_inv",
+    "q01",
+    "q01_a",
+    "gb003_sq1a",
+    "gb004_sq1a",
+    "q01sq01",
+    "q01sq01_a",
+    "q01sq02",
+    "q01sq02_a",
+    "q01sq03",
+    "q01sq03_a",
+    "q01sq04",
+    "q01sq04_a",
+    "q01sq04sq01",
+    "q01sq04sq01_a",
+    "q01sq04sq02",
+    "q01sq04sq02_a",
+    "ob002",
+    "q02",
+    "q02_a",
+    "q03",
+    "gb005_q03",
+    "q03_a1",
+    "q03_a2",
+    "q03_t1",
+    "q04",
+    "q04_a",
+    "gb006_sq4a",
+    "q04sq01",
+    "q04sq01_a",
+    "n10000text",
+    "n11000text",
+    "n12000text",
+    "n11100text",
+    "n11200text",
+    "n11110text",
+    "n11120text",
+    "flowchart_legend_0",
+    "flowchart_legend_1",
+    "flowchart_legend_2",
+    "flowchart_legend_3",
+    "flowchart_legend_4",
+    "q04sq02",
+    "q04sq02_a",
+    "q04_t",
+    "q05",
+    "gb0078_q05",
+    "gb009_q05",
+    "q05_a",
+    "q05sq01",
+    "cb_q5_001_text",
+    "cb_q5_002_text",
+    "cb_q5_003_text",
+    "cb_q5_004_text",
+    "ob004",
+    "ob004b",
+    "q05_footnote",
+    "q05sq02",
+    "q05sq02_a",
+    "q05sq03",
+    "q05sq03_a",
+    "q06",
+    "gb010_q06",
+    "q06_a",
+    "q07",
+    "q07_a",
+    "q08",
+    "q08_a",
+    "q09",
+    "q09_a",
+    "q10",
+    "q10_a",
+    "gb011_sq10a",
+    "q10sq01",
+    "q10sq01_a",
+    "q10sq02",
+    "q10sq02_a",
+    "q10sq03",
+    "q10sq03_a",
+    "q10sq04",
+    "q10sq04_a",
+]
 
 # Filter the df and select the rows with the narrative == sostenible_fi_eq & narrative == sostenible_fi
 # df = df.loc[
@@ -222,9 +191,91 @@ else:
 # ]
 
 
-# Process each row of the filtered DataFrame
-for index, row in df.iterrows():
-    # Parse the HTML using BeautifulSoup (create a new soup for each iteration)
+# Private use characters marking the content of the slots in a serialized soup
+SLOT_START = "\ue000"
+SLOT_END = "\ue001"
+SLOT_MARKERS = re.compile(f"({SLOT_START}[^{SLOT_START}]*{SLOT_START}|{SLOT_END})")
+
+# A compiled template: static HTML and (id, content) slots, in document order
+CompiledParts = Tuple[Union[str, Tuple[str, "CompiledParts"]], ...]
+
+
+class Slot:
+    """An element of a template being filled, whose content is replaced by id"""
+
+    __slots__ = ("id", "parts")
+
+    def __init__(self, slot_id: str, parts: list):
+        self.id = slot_id
+        self.parts = parts
+
+
+@lru_cache(maxsize=None)
+def compile_html(html: str, slot_ids: FrozenSet[str]) -> Optional[CompiledParts]:
+    """Parse html once and split its serialization around its slots
+
+    Slots are the elements whose id is in slot_ids; their content is compiled
+    too, so slots nested in slots are kept. Returns None if html cannot be
+    compiled faithfully (a marker in the text, a void or script/style slot).
+    """
+    if SLOT_START in html or SLOT_END in html:
+        return None
+
+    soup = BeautifulSoup(html, "html.parser")
+    for element in soup.find_all(id=lambda value: value in slot_ids):
+        if element.can_be_empty_element or element.name in ("script", "style"):
+            return None
+        element.insert(0, NavigableString(f"{SLOT_START}{element['id']}{SLOT_START}"))
+        element.append(NavigableString(SLOT_END))
+
+    # Rebuild the nesting of the slots from the markers of the serialization
+    stack: List[Tuple[Optional[str], list]] = [(None, [])]
+    for token in SLOT_MARKERS.split(str(soup)):
+        if token == SLOT_END:
+            slot_id, parts = stack.pop()
+            stack[-1][1].append((slot_id, tuple(parts)))
+        elif token.startswith(SLOT_START):
+            stack.append((token.strip(SLOT_START), []))
+        elif token:
+            stack[-1][1].append(token)
+    return tuple(stack[0][1])
+
+
+def instantiate(compiled: CompiledParts) -> list:
+    """Return a fresh, fillable copy of compiled parts"""
+    return [
+        part if isinstance(part, str) else Slot(part[0], instantiate(part[1]))
+        for part in compiled
+    ]
+
+
+def find_slot(parts: list, slot_id: str) -> Optional[Slot]:
+    """Return the first slot with slot_id in document order, like soup.find"""
+    for part in parts:
+        if isinstance(part, Slot):
+            if part.id == slot_id:
+                return part
+            found = find_slot(part.parts, slot_id)
+            if found is not None:
+                return found
+    return None
+
+
+def serialize(parts: list) -> str:
+    """Join the static HTML and the content of the slots"""
+    return "".join(
+        part if isinstance(part, str) else serialize(part.parts) for part in parts
+    )
+
+
+def cell_html(value) -> str:
+    """Return the HTML inserted for a cell of the narratives sheet"""
+    # Handle NaN values by inserting an empty string
+    return "" if pd.isna(value) else str(value)
+
+
+def render_with_soup(template_content: str, row, column_names: List[str]) -> str:
+    """Fill the template by parsing it and each cell value with BeautifulSoup"""
     soup = BeautifulSoup(template_content, "html.parser")
 
     # Loop through the column names and replace the content of the elements in the HTML
@@ -233,28 +284,280 @@ for index, row in df.iterrows():
         element = soup.find(id=col)
 
         if element:
-            # Get the value from the DataFrame (handle NaN and non-string types)
-            value = row[col]
-
-            if pd.isna(value):
-                value = ""  # Handle NaN values by inserting an empty string
-            else:
-                value = str(value)  # Ensure the value is converted to a string
-
             # Clear the existing content and insert the new content
             element.clear()  # Remove any existing content
             element.append(
-                BeautifulSoup(value, "html.parser")
+                BeautifulSoup(cell_html(row[col]), "html.parser")
             )  # Insert the new content safely
 
-    # Generate a unique filename for each row
-    output_filename = f"{row['narrative']}_narrative_template_{input_language}.html"
-    output_path = os.path.join(output_dir, output_filename)
+    return str(soup)
+
+
+def render_compiled(
+    template_content: str, row, column_names: List[str]
+) -> Optional[str]:
+    """Fill the template from its compiled slots, as render_with_soup does
+
+    The template and each distinct cell value are parsed once per process.
+    A value may hold the slot of a later column, which is then filled in it.
+    Returns None if the template or a value cannot be compiled.
+    """
+    slot_ids = frozenset(column_names)
+    compiled = compile_html(template_content, slot_ids)
+    if compiled is None:
+        return None
+
+    parts = instantiate(compiled)
+    for col in column_names:
+        slot = find_slot(parts, col)
+        if slot is not None:
+            value = compile_html(cell_html(row[col]), slot_ids)
+            if value is None:
+                return None
+            slot.parts = instantiate(value)
+    return serialize(parts)
+
+
+def language_columns(language):
+    """Return the columns filled in the templates of language"""
+    return ES_COLUMN_NAMES if language == "es" else COLUMN_NAMES
+
+
+def render_template(task):
+    """Fill the template for one sheet row of a language
+
+    task is (language, row, template_content, validate). Returns the HTML and
+    whether the compiled template differed from the BeautifulSoup one, which
+    is returned instead.
+    """
+    language, row, template_content, validate = task
+    column_names = language_columns(language)
+
+    html = render_compiled(template_content, row, column_names)
+    if html is None:
+        logging.warning(
+            f"{row['narrative']} ({language}) cannot use the compiled template"
+        )
+        return render_with_soup(template_content, row, column_names), False
+
+    if validate:
+        expected = render_with_soup(template_content, row, column_names)
+        if html != expected:
+            logging.error(
+                f"Compiled template of {row['narrative']} ({language}) differs, "
+                "writing the BeautifulSoup one"
+            )
+            return expected, True
+    return html, False
+
+
+def load_template_manifest(folder):
+    """Load the template manifest of the previous run, or an empty one"""
+    manifest_path = os.path.join(folder, TEMPLATE_MANIFEST_FILE)
+    empty_manifest = {"version": TEMPLATE_MANIFEST_VERSION, "templates": {}}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return empty_manifest
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable manifest {manifest_path}: {e}")
+        return empty_manifest
+
+    if manifest.get("version") != TEMPLATE_MANIFEST_VERSION:
+        logging.info("Template manifest version changed, rebuilding every template")
+        return empty_manifest
+    return manifest
+
+
+def save_template_manifest(folder, manifest):
+    """Write the template manifest next to the templates"""
+    manifest_path = os.path.join(folder, TEMPLATE_MANIFEST_FILE)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    logging.info(f"Template manifest saved to: {manifest_path}")
+
+
+def template_inputs_hash(row, language, template_hash):
+    """Return the SHA-256 of what the template of a sheet row is filled from
+
+    That is the language, its column list, the cells of the row in those
+    columns and the hash of template.html.
+    """
+    column_names = language_columns(language)
+    inputs = {
+        "language": language,
+        "template": template_hash,
+        "columns": column_names,
+        "values": [
+            cell_html(row[col]) if col in row.index else None for col in column_names
+        ],
+    }
+    return hashlib.sha256(
+        json.dumps(inputs, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def build_all_templates(languages=LANGUAGES, validate=False, workers=1, force=False):
+    """Write the narrative templates of several languages in one pass
+
+    Every sheet is read in one open of the workbook, and the template is read
+    once and compiled once per column list. Only the templates whose inputs
+    changed since the last run (see template_inputs_hash), or all of them with
+    force, are rendered and written; the others are left untouched. With
+    workers > 1 the templates are rendered in a process pool. With validate,
+    each one rendered is also filled with BeautifulSoup, as before; a template
+    that differs is logged and written from BeautifulSoup. Returns the number
+    of templates that differed.
+    """
+    # Load the sheets of every language from one open of the workbook
+    sheets = pd.read_excel(excel_file, sheet_name=list(languages))
+
+    # Load the HTML template
+    with open(template_file, "r", encoding="utf-8") as file:
+        template_content = file.read()
+    template_hash = hashlib.sha256(template_content.encode("utf-8")).hexdigest()
+
+    # Ensure the output directory exists
+    os.makedirs(output_dir, exist_ok=True)
+
+    # The template of each row, by file name; a later row of the same
+    # narrative overwrote an earlier one, so it is the one kept
+    outputs = {}
+    for language in languages:
+        for _, row in sheets[language].iterrows():
+            output_filename = f"{row['narrative']}_narrative_template_{language}.html"
+            outputs[output_filename] = (
+                (language, row, template_content, validate),
+                template_inputs_hash(row, language, template_hash),
+            )
+
+    # Only render the templates whose inputs changed or whose file is missing
+    manifest = load_template_manifest(output_dir)
+    changes = {"new": [], "changed": [], "forced": [], "unchanged": []}
+    stale = {}
+    for output_filename, (task, digest) in outputs.items():
+        entry = manifest["templates"].get(output_filename)
+        if entry is None or not os.path.exists(
+            os.path.join(output_dir, output_filename)
+        ):
+            status = "new"
+        elif entry["hash"] != digest:
+            status = "changed"
+        elif force:
+            status = "forced"
+        else:
+            status = "unchanged"
+        changes[status].append(output_filename)
+        if status != "unchanged":
+            stale[output_filename] = task
+
+    # Templates of these languages no longer in their sheets are left on disk
+    changes["removed"] = [
+        output_filename
+        for output_filename, entry in manifest["templates"].items()
+        if entry["language"] in languages and output_filename not in outputs
+    ]
+
+    tasks = list(stale.values())
+    if workers > 1 and len(tasks) > 1:
+        logging.info(f"Rendering {len(tasks)} templates on {workers} workers")
+        # Chunks share one pickled copy of the template
+        chunksize = max(1, len(tasks) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rendered = list(pool.map(render_template, tasks, chunksize=chunksize))
+    else:
+        rendered = [render_template(task) for task in tasks]
+
+    mismatches = 0
+    for output_filename, (html, differed) in zip(stale, rendered):
+        mismatches += differed
+        output_path = os.path.join(output_dir, output_filename)
+
+        # Save the result to a new HTML file in the specified directory
+        with open(output_path, "w", encoding="utf-8") as output_file:
+            output_file.write(html)
+
+        language = stale[output_filename][0]
+        manifest["templates"][output_filename] = {
+            "language": language,
+            "hash": outputs[output_filename][1],
+        }
+        print(f"Generated HTML file: {output_path}")
+
+    for output_filename in changes["removed"]:
+        del manifest["templates"][output_filename]
+    save_template_manifest(output_dir, manifest)
+
+    # Summarize what changed since the last run
+    for status in ("new", "changed", "forced", "removed"):
+        for output_filename in changes[status]:
+            print(f"  {status}: {output_filename}")
+    print(
+        "Templates: "
+        + ", ".join(f"{len(names)} {status}" for status, names in changes.items())
+    )
+
+    if validate:
+        logging.info(f"Validated {len(tasks)} templates: {mismatches} differed")
+    print("All files have been generated.")
+    return mismatches
+
+
+def build_templates(input_language, validate=False):
+    """Write the narrative templates of input_language from its sheet
+
+    See build_all_templates. Returns the number of templates that differed.
+    """
+    return build_all_templates([input_language], validate)
+
+
+if __name__ == "__main__":
+    # Set up logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.FileHandler("logs/template_builder.log"),
+            logging.StreamHandler(),
+        ],
+    )
+
+    # Languages are the arguments that are not options, "all" for every sheet
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if args == ["all"]:
+        languages = LANGUAGES
+    elif args:
+        languages = list(dict.fromkeys(args))
+
+    # ask input for language (es, en, pt, or  pl) assign to constant
+    else:
+        try:
+            languages = [input("Enter the language code (es, en, pt, or pl): ")]
+        except ValueError as e:
+            print(e)
+            logging.error(e)
+
+    # Validate the input langugages
+    for input_language in languages:
+        if input_language not in LANGUAGES:
+            raise ValueError(
+                "Invalid language code. Please enter 'es', 'en', 'pt', or 'pl'."
+            )
 
-    # Save the result to a new HTML file in the specified directory
-    with open(output_path, "w", encoding="utf-8") as output_file:
-        output_file.write(str(soup))
+    # --workers=N renders the templates in N processes
+    workers = next(
+        (
+            int(arg.split("=", 1)[1])
+            for arg in sys.argv[1:]
+            if arg.startswith("--workers=")
+        ),
+        1,
+    )
 
-    print(f"Generated HTML file: {output_path}")
+    # --force rewrites every template, not only the ones whose inputs changed
+    force = "--force" in sys.argv[1:]
 
-print("All files have been generated.")
+    # --validate checks the compiled templates against BeautifulSoup
+    if build_all_templates(languages, "--validate" in sys.argv[1:], workers, force):
+        sys.exit(1)
@@ -1,22 +1,22 @@
-import json
 import logging
 import os
 import sys
+import traceback
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 
+import matplotlib
 import numpy as np
 import pandas as pd
 import plot_builder
+from add_column_table import add_sector_column
 from bs4 import BeautifulSoup
+from html_table_generator import generate_html_table
 from jinja2 import Environment, FileSystemLoader
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("logs/report_builder.log"), logging.StreamHandler()],
-)
+from processed_data_store import load_processed_store, load_table_records
+from translation_catalog import get_catalog
 
 # Suppress the specific warning
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
@@ -31,33 +31,6 @@ def ticker_opposite(input_array: list) -> str:
     return "X" if np.all(np.nan_to_num(input_array) == 0) else ""
 
 
-# Get the current script's directory
-script_dir = os.path.dirname(os.path.abspath(__file__))
-# Load translations
-with open(os.path.join(script_dir, "translations.json"), "r", encoding="utf-8") as f:
-    translations = json.load(f)
-
-# Check if languge code is provided as a command-line argument
-if len(sys.argv) > 1:
-    input_language = sys.argv[1]
-
-# ask input for language (es, en, pt, or  pl) assign to constant
-else:
-    try:
-        input_language = input("Enter the language code (es, en, pt, or pl): ")
-    except ValueError as e:
-        print(e)
-        logging.error(e)
-
-# Validate the input langugage
-if not isinstance(input_language, str) or input_language not in [
-    "es",
-    "en",
-    "pt",
-    "pl",
-]:
-    raise ValueError("Invalid language code. Please enter 'es', 'en', 'pt', or 'pl'.")
-
 # Get the current script's directory
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -65,45 +38,100 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 date = datetime.now().strftime("%Y%m%d")
 
 # Set up paths
-excel_path = os.path.join(
-    script_dir,
-    "..",
-    "final_processed_data",
-    f"{date}_final_processed_data.xlsx",
-)
-
+processed_data_dir = os.path.join(script_dir, "..", "final_processed_data")
 template_dir = os.path.join(script_dir, "..", "narrative_templates")
 output_dir = os.path.join(script_dir, "..", "final_reports")
 plots_dir = os.path.join(output_dir, "plots")
 
-# Create output directories
-os.makedirs(output_dir, exist_ok=True)
-os.makedirs(plots_dir, exist_ok=True)
 
-# Read the Excel file
-df = pd.read_excel(excel_path)
-# Remove unwanted spaces from column names
-df.columns = df.columns.str.strip()
+def load_processed_data():
+    """Read the final processed data of the day
+
+    Data prep writes {date}_final_processed_data.parquet, for every language.
+    An Excel copy (--excel) is read instead only if it was saved after the
+    store, e.g. when it was edited by hand.
+    """
+    paths = [
+        os.path.join(processed_data_dir, f"{date}_final_processed_data{ext}")
+        for ext in (".parquet", ".xlsx")
+    ]
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        raise FileNotFoundError(
+            f"No final processed data of {date} in {processed_data_dir}"
+        )
+    # The first of the newest wins, so a store beats a copy saved at once
+    path = max(paths, key=os.path.getmtime)
+
+    if path.endswith(".parquet"):
+        return load_processed_store(path)
+
+    # Read the Excel file
+    df = pd.read_excel(path)
+    # Remove unwanted spaces from column names
+    df.columns = df.columns.str.strip()
+    logging.info(f"Final processed data read from: {path}")
+    return df
+
+
+def render_tables(
+    tables_file, input_language, sector_mapping=None, data_dir=processed_data_dir
+):
+    """Translate and render the tables of a fund saved by data prep
+
+    tables_file is relative to data_dir, the folder of the final processed data
+    the row was read from. With sector_mapping (see
+    add_column_table.load_sector_mapping) the sector table gets the sector of
+    each of its subsectors. Returns the HTML of the top investments and sector
+    tables.
+    """
+    tables = load_table_records(os.path.join(data_dir, tables_file))
+    sector_df = tables["q04_t"]
+    if sector_mapping is not None:
+        sector_df = add_sector_column(sector_df, sector_mapping)
+    return (
+        generate_html_table(tables["q03_t1"], "investment", input_language),
+        generate_html_table(sector_df, "sector", input_language),
+    )
+
+
+@lru_cache(maxsize=None)
+def report_environment():
+    """Return the Jinja2 environment of this process, set up once"""
+    return Environment(loader=FileSystemLoader(template_dir))
+
+
+def init_report_worker():
+    """Set up a report process once: a non-interactive matplotlib backend and
+    its Jinja2 environment"""
+    matplotlib.use("Agg")
+    report_environment()
 
-# Set up Jinja2 environment
-env = Environment(loader=FileSystemLoader(template_dir))
 
-# Generate a report for each row
-for index, row in df.iterrows():
+def render_report(
+    index, row, input_language, sector_mapping=None, data_dir=processed_data_dir
+):
+    """Render and write the report of one row of the final processed data
+
+    sector_mapping and data_dir are passed on to render_tables. Returns the
+    report's filename, or None if the row has no template.
+    """
     # Determine the template file based on the 'narrative' column
     template_file = f"{row['narrative']}_narrative_template_{input_language}.html"
 
     # Check if the template file exists
     if not os.path.exists(os.path.join(template_dir, template_file)):
-        print(f"Warning: Template file {template_file} not found. Skipping this row.")
-        continue
+        return None
 
     # Get the template
-    template = env.get_template(template_file)
+    template = report_environment().get_template(template_file)
+
+    # Generate the plot, or reuse the cached one of the same inputs
+    plot_filename = plot_builder.build_plot(row, plots_dir, input_language)
 
-    # Generate the plot
-    plot_filename = plot_builder.build_plot(
-        row, plots_dir, index, translations, input_language
+    # Render the tables of the fund from its side file
+    investment_table, sector_table = render_tables(
+        row["tables_file"], input_language, sector_mapping, data_dir
     )
 
     # Replace NaN in specific columns with an empty string for rendering
@@ -247,15 +275,15 @@ for index, row in df.iterrows():
 
     # Update top investments table: div with id "q03_t1"
     q03_t1_div = soup.find("div", id="q03_t1")
-    if q03_t1_div and "q03_t1" in row:
+    if q03_t1_div:
         q03_t1_div.clear()
-        q03_t1_div.append(BeautifulSoup(row["q03_t1"], "html.parser"))
+        q03_t1_div.append(BeautifulSoup(investment_table, "html.parser"))
 
     # Update sectorial distribution table: div with id "q04_t"
     q04_t_div = soup.find("div", id="q04_t")
-    if q04_t_div and "q04_t" in row:
+    if q04_t_div:
         q04_t_div.clear()
-        q04_t_div.append(BeautifulSoup(row["q04_t"], "html.parser"))
+        q04_t_div.append(BeautifulSoup(sector_table, "html.parser"))
 
     # Find the div with class "chart"
     chart_div = soup.find("div", class_="chart")
@@ -281,4 +309,146 @@ for index, row in df.iterrows():
     with open(os.path.join(output_dir, filename), "w", encoding="utf-8") as f:
         f.write(modified_html_content)
 
-print(f"Generated {len(df)} reports in the '{output_dir}' directory.")
+    return filename
+
+
+def render_report_chunk(chunk):
+    """Render the reports of a chunk of rows, catching the errors of each row
+
+    chunk is (input_language, sector_mapping, data_dir, [(index, row), ...]).
+    Returns (filename, traceback) for each row, filename None for a row
+    without template or that failed, and the texts that had no translation.
+    """
+    input_language, sector_mapping, data_dir, rows = chunk
+    results = []
+    for index, row in rows:
+        try:
+            filename = render_report(
+                index, row, input_language, sector_mapping, data_dir
+            )
+            results.append((filename, None))
+        except Exception:
+            results.append((None, traceback.format_exc()))
+    return results, get_catalog(input_language).take_misses()
+
+
+def build_reports(
+    df, input_language, sector_mapping=None, workers=1, data_dir=processed_data_dir
+):
+    """Render the report of each row of the final processed data
+
+    data_dir is the folder df was read from, which holds the side files of
+    its tables_file column. sector_mapping and data_dir are passed on to
+    render_tables. With workers > 1 the rows are rendered in chunks in a
+    process pool, each worker setting up its Jinja2 environment and matplotlib
+    once. A row that fails is logged and the others are still rendered.
+    Returns the filenames of the reports written.
+    """
+    # Create output directories
+    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(plots_dir, exist_ok=True)
+
+    rows = list(df.iterrows())
+    if workers > 1 and len(rows) > 1:
+        # A few chunks per worker, so that slow rows do not hold up the rest
+        size = -(-len(rows) // (workers * 4))
+        chunks = [
+            (input_language, sector_mapping, data_dir, rows[start : start + size])
+            for start in range(0, len(rows), size)
+        ]
+        logging.info(f"Rendering {len(rows)} reports on {workers} workers")
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=init_report_worker
+        ) as pool:
+            chunk_results = list(pool.map(render_report_chunk, chunks))
+    else:
+        chunk_results = [
+            render_report_chunk((input_language, sector_mapping, data_dir, rows))
+        ]
+
+    # Report the rows in their order, whichever process rendered them
+    catalog = get_catalog(input_language)
+    results = []
+    for chunk, misses in chunk_results:
+        catalog.add_misses(misses)
+        results.extend(chunk)
+
+    filenames, skipped, failed = [], 0, 0
+    for (index, row), (filename, error) in zip(rows, results):
+        if error is not None:
+            failed += 1
+            logging.error(
+                f"Error building the report of {row['{{product_name}}']} "
+                f"(row {index}):\n{error}"
+            )
+        elif filename is None:
+            skipped += 1
+            template_file = (
+                f"{row['narrative']}_narrative_template_{input_language}.html"
+            )
+            print(
+                f"Warning: Template file {template_file} not found. "
+                "Skipping this row."
+            )
+        else:
+            filenames.append(filename)
+
+    # Log the plot texts without translation once for the whole run
+    catalog.report_misses()
+
+    # Keep the plot cache within its size, now that no worker is using it
+    plot_builder.evict_plot_cache()
+
+    print(
+        f"Generated {len(filenames)} reports in the '{output_dir}' directory "
+        f"({skipped} skipped, {failed} failed)."
+    )
+    return filenames
+
+
+if __name__ == "__main__":
+    # Set up logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.FileHandler("logs/report_builder.log"),
+            logging.StreamHandler(),
+        ],
+    )
+
+    # Check if languge code is provided as a command-line argument
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if args:
+        input_language = args[0]
+
+    # ask input for language (es, en, pt, or  pl) assign to constant
+    else:
+        try:
+            input_language = input("Enter the language code (es, en, pt, or pl): ")
+        except ValueError as e:
+            print(e)
+            logging.error(e)
+
+    # Validate the input langugage
+    if not isinstance(input_language, str) or input_language not in [
+        "es",
+        "en",
+        "pt",
+        "pl",
+    ]:
+        raise ValueError(
+            "Invalid language code. Please enter 'es', 'en', 'pt', or 'pl'."
+        )
+
+    # --workers=N renders the reports in N processes
+    workers = next(
+        (
+            int(arg.split("=", 1)[1])
+            for arg in sys.argv[1:]
+            if arg.startswith("--workers=")
+        ),
+        1,
+    )
+
+    build_reports(load_processed_data(), input_language, workers=workers)
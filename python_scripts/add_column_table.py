@@ -3,17 +3,59 @@ from bs4 import BeautifulSoup
 from io import StringIO
 
 
+def load_sector_mapping(mapping_excel_path):
+    """Read the Excel file mapping each subsector to its sector."""
+    map_sector_df = pd.read_excel(mapping_excel_path)
+    if (
+        "Subsectors" not in map_sector_df.columns
+        or "Sectors" not in map_sector_df.columns
+    ):
+        raise ValueError(
+            "Mapping Excel file must contain 'Subsectors' and 'Sectors' columns."
+        )
+    return map_sector_df
+
+
+def add_sector_column(df, map_sector_df):
+    """
+    Add a 'Sectors' column to a sector distribution table.
+
+    The sectors of the table ('Sectors' or 'Sector' column) are subsectors of
+    the mapping. Returns a table with the columns Sectors, Subsectors, % Assets.
+    """
+    # Rename the column "Sectors" (or "Sector") to "Subsector"
+    if "Sectors" in df.columns:
+        df = df.rename(columns={"Sectors": "Subsector"})
+    elif "Sector" in df.columns:
+        df = df.rename(columns={"Sector": "Subsector"})
+    else:
+        raise ValueError(
+            "Expected column 'Sectors' or 'Sector' not found in the table."
+        )
+
+    # Merge the original DataFrame with the mapping DataFrame.
+    merged_df = pd.merge(
+        df, map_sector_df, left_on="Subsector", right_on="Subsectors", how="left"
+    )
+    merged_df.drop(columns=["Subsectors"], inplace=True)
+    merged_df = merged_df[["Sectors", "Subsector", "% Assets"]]
+
+    # rename columns "Subsector" to "Subsectors"
+    return merged_df.rename(columns={"Subsector": "Subsectors"})
+
+
 def process_html_file(html_file_path, mapping_excel_path):
     """
     Process an HTML file by finding the <div id="q04_t">, modifying its table,
     and returning the modified HTML as a string.
 
+    For reports built without it; 02_report_builder.build_reports adds the
+    column to the sector data directly when given the mapping.
+
     Transformation steps:
       1. Convert the table to a pandas DataFrame.
-      2. Rename the column 'Sectors' (or 'Sector') to 'Subsector'.
-      3. Merge with the mapping Excel file to add a 'Sectors' column.
-      4. Reorder columns to: Sectors, Subsector, % Assets.
-      5. Convert back to an HTML table with a <colgroup> containing three <col> tags.
+      2. Add the 'Sectors' column with add_sector_column.
+      3. Convert back to an HTML table with a <colgroup> containing three <col> tags.
     """
     # Read the HTML file
     with open(html_file_path, "r", encoding="utf-8") as f:
@@ -37,37 +79,8 @@ def process_html_file(html_file_path, mapping_excel_path):
     dfs = pd.read_html(StringIO(table_html))
     if not dfs:
         raise ValueError("No table could be parsed from the HTML snippet.")
-    df = dfs[0]
-
-    # Rename the column "Sectors" (or "Sector") to "Subsector"
-    if "Sectors" in df.columns:
-        df.rename(columns={"Sectors": "Subsector"}, inplace=True)
-    elif "Sector" in df.columns:
-        df.rename(columns={"Sector": "Subsector"}, inplace=True)
-    else:
-        raise ValueError(
-            "Expected column 'Sectors' or 'Sector' not found in the table."
-        )
-
-    # Read the mapping Excel file into a DataFrame
-    map_sector_df = pd.read_excel(mapping_excel_path)
-    if (
-        "Subsectors" not in map_sector_df.columns
-        or "Sectors" not in map_sector_df.columns
-    ):
-        raise ValueError(
-            "Mapping Excel file must contain 'Subsectors' and 'Sectors' columns."
-        )
-
-    # Merge the original DataFrame with the mapping DataFrame.
-    merged_df = pd.merge(
-        df, map_sector_df, left_on="Subsector", right_on="Subsectors", how="left"
-    )
-    merged_df.drop(columns=["Subsectors"], inplace=True)
-    merged_df = merged_df[["Sectors", "Subsector", "% Assets"]]
 
-    # rename columns "Subsector" to "Subsectors"
-    merged_df.rename(columns={"Subsector": "Subsectors"}, inplace=True)
+    merged_df = add_sector_column(dfs[0], load_sector_mapping(mapping_excel_path))
 
     # Convert the merged DataFrame back into an HTML table.
     new_table_html = merged_df.to_html(index=False, border=0, classes="table")
@@ -1,18 +1,105 @@
 import pandas as pd
 import numpy as np
 import os
+import argparse
+import json
 import logging
-from typing import List, Dict, Tuple
+import logging.handlers
+import queue
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import (
+    AbstractSet,
+    Callable,
+    Iterable,
+    List,
+    Dict,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 import warnings
 from openpyxl import load_workbook
 
+from fingerprints import file_fingerprint
+
 # Suppress the specific warning
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
+# Monthly Aladdin files and their averages, relative to the project folder
+INPUT_FOLDER = "excel_books/aladdin_data/aladdin_input"
+OUTPUT_FOLDER = "excel_books/aladdin_data/aladdin_data_processed"
+
+# Sheets averaged across the monthly files of a group
+AVERAGED_SHEETS = [
+    "Post-Contractual Info Data",
+    "Sectorial Distribution",
+    "Top Investments",
+]
+
+# Manifest of the inputs behind each average_output file, for incremental runs
+MANIFEST_FILE = "average_manifest.json"
+MANIFEST_VERSION = 3
+
+# Display format of the averaged percentages, applied when written out
+SECTOR_PERCENT_FORMAT = "{:.1%}"
+TOP_INVESTMENTS_PERCENT_FORMAT = "{:.2%}"
+
+# Number of holdings kept in the averaged 'Top Investments' table
+TOP_INVESTMENTS_ROWS = 15
+
+# Rows from which largest_rows selects with nlargest; below it a full sort is
+# faster (about 4x at 1,000 rows, see the top_n benchmark)
+PARTIAL_SELECTION_MIN_ROWS = 30_000
+
+# 'Top Investments' columns kept from the first file that fills them
+TOP_INVESTMENTS_METADATA = ["Largest Investments", "Sector", "Country Name"]
+
+
+class AveragingProfile(NamedTuple):
+    """Settings of one family of funds averaged by this script."""
+
+    prefix_length: int  # characters of the file name shared by a fund's files
+    sector_format: str  # display format of the sector percentages
+    top_investments_format: str  # display format of the holding percentages
+    top_investments_divisor: float  # turns 'Top Investments' values into fractions
+    top_n: Optional[int]  # holdings kept in 'Top Investments'; None keeps all
+    output_subfolder: str  # folder of the outputs within the output folder
+
+
+# Fund families, by the name given to --profiles
+PROFILES = {
+    # 10 characters so the Polish files get their own groups
+    "aladdin": AveragingProfile(
+        prefix_length=10,
+        sector_format=SECTOR_PERCENT_FORMAT,
+        top_investments_format=TOP_INVESTMENTS_PERCENT_FORMAT,
+        top_investments_divisor=1.0,
+        top_n=TOP_INVESTMENTS_ROWS,
+        output_subfolder="",
+    ),
+    # Every holding, with high precision percentages; kept apart from the
+    # aladdin outputs, which data prep reads back with --resume
+    "anathrax": AveragingProfile(
+        prefix_length=9,
+        sector_format="{:.9%}",
+        top_investments_format="{:.9%}",
+        top_investments_divisor=100.0,
+        top_n=None,
+        output_subfolder="anathrax",
+    ),
+}
+
+# Outputs of each group: the typed Parquet store read by data prep, plus the
+# Excel copy for people to read when it is asked for
+OUTPUT_FORMATS = ("parquet",)
+EXCEL_OUTPUT_FORMATS = OUTPUT_FORMATS + ("xlsx",)
+STORE_TABLES = [
+    "post_contractual.parquet",
+    "sectorial.parquet",
+    "top_investments.parquet",
+]
 
 
 def set_up_dir(output_folder: str, input_folder: str) -> None:
@@ -28,33 +115,108 @@ def set_up_dir(output_folder: str, input_folder: str) -> None:
     logging.info(f"Input folder exists: {input_folder}")
 
 
-def group_files(input_folder: str) -> Dict[str, List[str]]:
-    """Group files by the first 9 characters in their names."""
+def group_files(input_folder: str, prefix_length: int = 10) -> Dict[str, List[str]]:
+    """Group files by the first prefix_length characters in their names.
+
+    Leading and trailing spaces are removed from the prefixes.
+    """
     all_files = [file for file in os.listdir(input_folder) if file.endswith(".xlsx")]
     file_groups = {}  # created dictionary to store the grouped files
     for file in all_files:
-        prefix = file[:10]  # Extract the first 9 characters | 10 for Polish files
+        prefix = file[:prefix_length].strip()  # Extract the first characters
         if prefix not in file_groups:
-            file_groups[prefix] = []  # keys are first 9-char & vals are list of files
+            file_groups[prefix] = []  # keys are prefixes & vals are list of files
         file_groups[prefix].append(os.path.join(input_folder, file))
     logging.info(f"Grouped {len(all_files)} files into {len(file_groups)} groups")
     return file_groups
 
 
-def process_post_contractual(files: List[str]) -> pd.DataFrame:
+def load_workbooks(
+    files: List[str], template_files: Iterable[str] = ()
+) -> Dict[str, Dict[str, pd.DataFrame]]:
+    """Open each workbook once and keep the sheets the run needs.
+
+    The averaged sheets are stored raw (header=None, nothing skipped) so the
+    process_* functions can slice them with get_sheet. Template files also
+    keep their other sheets, parsed as pd.read_excel would, for save_results.
+    """
+    template_files = set(template_files)
+    workbooks = {}
+    for file in files:
+        sheets = {}
+        try:
+            with pd.ExcelFile(file) as xlsx:
+                for sheet_name in xlsx.sheet_names:
+                    if sheet_name in AVERAGED_SHEETS:
+                        sheets[sheet_name] = xlsx.parse(sheet_name, header=None)
+                    elif file in template_files:
+                        sheets[sheet_name] = xlsx.parse(sheet_name)
+        except Exception as e:
+            logging.error(f"Error opening file {file}: {str(e)}")
+        workbooks[file] = sheets
+    logging.info(f"Loaded {len(workbooks)} workbooks")
+    return workbooks
+
+
+def get_sheet(
+    workbooks: Dict[str, Dict[str, pd.DataFrame]],
+    file: str,
+    sheet_name: str,
+    skiprows: int = 0,
+    nrows: Optional[int] = None,
+    usecols: Optional[List[int]] = None,
+) -> pd.DataFrame:
+    """Slice a cached sheet the way pd.read_excel(header=None, ...) reads it."""
+    sheets = workbooks.get(file, {})
+    if sheet_name not in sheets:
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+    df = sheets[sheet_name]
+    stop = None if nrows is None else skiprows + nrows
+    df = df.iloc[skiprows:stop]
+    if usecols is not None:
+        df = df.iloc[:, usecols]
+
+    # Re-infer dtypes on the slice only, as a targeted read would
+    return df.reset_index(drop=True).infer_objects()
+
+
+def parse_numeric_block(block: np.ndarray) -> np.ndarray:
+    """Parse a 2D block of raw cells into floats in one vectorized pass.
+
+    Numeric cells are kept as they are, text cells lose their '%' suffix and
+    thousands separators, and empty or unparseable cells become 0.
+    """
+    cells = pd.Series(block.ravel(), dtype=object)
+
+    # Numbers pass through untouched; only text needs cleaning up
+    numbers = pd.to_numeric(cells, errors="coerce")
+    text = cells.astype(str).str.rstrip("%").str.replace(",", "")
+    parsed = pd.to_numeric(text, errors="coerce")
+
+    values = numbers.fillna(parsed).fillna(0)
+    return values.to_numpy(dtype="float64").reshape(block.shape)
+
+
+def process_post_contractual(
+    files: List[str], workbooks: Optional[Dict[str, Dict[str, pd.DataFrame]]] = None
+) -> pd.DataFrame:
     """Process 'Post-Contractual Info Data' sheet efficiently."""
     if not files:
         raise ValueError("No files provided to process_post_contractual")
 
-    values_list = []
+    if workbooks is None:
+        workbooks = load_workbooks(files)
+
+    rows = []
     security_description = None
     for file in files:
         try:
             # Read data row
-            df = pd.read_excel(
+            df = get_sheet(
+                workbooks,
                 file,
-                sheet_name="Post-Contractual Info Data",
-                header=None,
+                "Post-Contractual Info Data",
                 skiprows=4,  # Skip header rows
                 nrows=1,  # Read only the data row
             )
@@ -63,34 +225,20 @@ def process_post_contractual(files: List[str]) -> pd.DataFrame:
             if security_description is None:
                 security_description = df.iloc[0, 0]
 
-            # Convert percentage values and handle empty cells
-            for col in df.columns:
-                if df[col].dtype == object:  # If column contains strings/objects
-                    df[col] = df[col].astype(str).str.rstrip("%").str.replace(",", "")
-                    df[col] = pd.to_numeric(df[col], errors="coerce")
-
-            # Fill NaN values with 0
-            df = df.fillna(0)
-
-            # Store first column separately and convert rest to numeric
-            first_col = df[0].values[0]  # Store security description
-            numeric_values = df.iloc[:, 1:].values[0]  # Get only numeric columns
-
-            values_list.append(numeric_values)
+            # Keep the raw cells after the security description
+            rows.append(df.iloc[0, 1:].to_numpy(dtype=object))
 
         except Exception as e:
             logging.error(f"Error processing file {file}: {str(e)}")
 
-    if not values_list:
+    if not rows:
         raise ValueError("No valid data found in any of the files")
 
-    # Calculate average values for numeric columns
-    average_values = np.mean(values_list, axis=0)
+    # Parse the data rows of every file as one block and average them
+    average_values = parse_numeric_block(np.vstack(rows)).mean(axis=0)
 
     # Read the header from the first file
-    header_df = pd.read_excel(
-        files[0], sheet_name="Post-Contractual Info Data", header=None, nrows=4
-    )
+    header_df = get_sheet(workbooks, files[0], "Post-Contractual Info Data", nrows=4)
 
     # Create result DataFrame
     result_df = pd.DataFrame(columns=header_df.columns)
@@ -104,37 +252,59 @@ def process_post_contractual(files: List[str]) -> pd.DataFrame:
     return result_df
 
 
-def process_sectorial_distribution(files: List[str]) -> pd.DataFrame:
+def read_sector_sheet(
+    workbooks: Dict[str, Dict[str, pd.DataFrame]], file: str
+) -> Optional[pd.DataFrame]:
+    """Read the raw sector and percentage columns of 'Sectorial Distribution'.
+
+    Returns None, with a warning, when the sheet has no rows.
+    """
+    # Read only columns B and C (indices 1 and 2), starting from row 6
+    df = get_sheet(
+        workbooks,
+        file,
+        "Sectorial Distribution",
+        usecols=[1, 2],  # Read only columns B and C
+        skiprows=5,  # Skip the first 5 rows (start from row 6)
+    )
+
+    if df.empty:
+        logging.warning(f"Empty 'Sectorial Distribution' sheet in file: {file}")
+        return None
+    return df
+
+
+def clean_sector_sheet(df: pd.DataFrame) -> pd.DataFrame:
+    """Name the sector columns and turn the percentages into fractions."""
+    # Rename columns for clarity
+    df.columns = ["Sector", "Market Value %"]
+
+    # Convert percentage strings to numeric values
+    df["Market Value %"] = (
+        pd.to_numeric(df["Market Value %"].astype(str).str.rstrip("%"), errors="coerce")
+        / 100.0
+    )
+
+    # Remove any rows where sector is missing
+    return df.dropna(subset=["Sector"])
+
+
+def process_sectorial_distribution(
+    files: List[str],
+    workbooks: Optional[Dict[str, Dict[str, pd.DataFrame]]] = None,
+    profile: AveragingProfile = PROFILES["aladdin"],
+) -> pd.DataFrame:
     """Process 'Sectorial Distribution' sheet more efficiently."""
+    if workbooks is None:
+        workbooks = load_workbooks(files)
+
     df_list = []
     for file in files:
         try:
-            # Read only columns B and C (indices 1 and 2), starting from row 6
-            df = pd.read_excel(
-                file,
-                sheet_name="Sectorial Distribution",
-                header=None,
-                usecols=[1, 2],  # Read only columns B and C
-                skiprows=5,  # Skip the first 5 rows (start from row 6)
-            )
-
-            if df.empty:
-                logging.warning(f"Empty 'Sectorial Distribution' sheet in file: {file}")
+            df = read_sector_sheet(workbooks, file)
+            if df is None:
                 continue
-
-            # Rename columns for clarity
-            df.columns = ["Sector", "Market Value %"]
-
-            # Convert percentage strings to numeric values
-            df["Market Value %"] = (
-                pd.to_numeric(
-                    df["Market Value %"].astype(str).str.rstrip("%"), errors="coerce"
-                )
-                / 100.0
-            )
-
-            # Remove any rows where sector is missing
-            df = df.dropna(subset=["Sector"])
+            df = clean_sector_sheet(df)
 
             # Sum percentages for each sector within the file
             df = df.groupby("Sector")["Market Value %"].sum().reset_index()
@@ -164,22 +334,225 @@ def process_sectorial_distribution(files: List[str]) -> pd.DataFrame:
     # Sort by percentage in descending order
     result_df = result_df.sort_values("% Assets", ascending=False)
 
-    # Format percentages with high precision
-    result_df["% Assets"] = result_df["% Assets"].map("{:.1%}".format)
+    # Keep percentages as floats; they are formatted when written out
+    result_df.attrs["percent_format"] = profile.sector_format
 
     return result_df
 
 
-def process_top_investments(files: List[str]) -> pd.DataFrame:
-    """Process 'Top Investments' sheet with normalized averages."""
+def process_sectorial_distributions(
+    file_groups: Dict[str, List[str]],
+    workbooks: Dict[str, Dict[str, Dict[str, pd.DataFrame]]],
+    profile: AveragingProfile = PROFILES["aladdin"],
+) -> Dict[str, pd.DataFrame]:
+    """Process the 'Sectorial Distribution' sheets of many groups at once.
+
+    The sheets of every group are stacked into one frame keyed by prefix and
+    file, with the sectors encoded as one shared categorical. A handful of
+    grouped operations then average and normalize every fund together, and
+    the result is split back into the per-prefix frames that
+    process_sectorial_distribution returns. workbooks maps each prefix to the
+    load_workbooks cache of its files.
+
+    If the batch fails, each group is averaged on its own instead; a group
+    that still fails is left out, for process_group to average it again.
+    """
     df_list = []
+    keys = []  # (prefix, file index) of each sheet in df_list
+    for prefix, files in file_groups.items():
+        for file_index, file in enumerate(files):
+            try:
+                df = read_sector_sheet(workbooks[prefix], file)
+                if df is None:
+                    continue
+                df_list.append(df)
+                keys.append((prefix, file_index))
+
+            except Exception as e:
+                logging.error(f"Error processing file {file}: {str(e)}")
+
+    results = {prefix: pd.DataFrame() for prefix in file_groups}
+    if not df_list:
+        return results
+
+    try:
+        # Stack and clean every sheet at once, sharing one dictionary of sectors
+        combined_df = pd.concat(df_list, keys=keys, names=["prefix", "file", None])
+        combined_df = clean_sector_sheet(combined_df).reset_index(level=[0, 1])
+        combined_df["Sector"] = combined_df["Sector"].astype("category")
+
+        # Sum each sector within each file, then average the files of each fund
+        per_file = combined_df.groupby(["prefix", "file", "Sector"], observed=True)[
+            "Market Value %"
+        ].sum()
+        per_fund = per_file.groupby(level=["prefix", "Sector"], observed=True).mean()
+
+        # Normalize percentages so that each fund sums to 100%
+        per_fund = per_fund / per_fund.groupby(level="prefix").transform("sum")
+
+        # Sort every fund by percentage in descending order, then split them back
+        result_df = per_fund.rename("% Assets").reset_index()
+        result_df = result_df.sort_values(
+            ["prefix", "% Assets"], ascending=[True, False], kind="stable"
+        )
+        for prefix, fund_df in result_df.groupby("prefix", sort=False):
+            sectors = pd.Index(fund_df["Sector"].astype(object), name="Sectors")
+            sectorial = pd.DataFrame(
+                {"% Assets": fund_df["% Assets"].to_numpy()}, index=sectors
+            )
+            # Keep percentages as floats; they are formatted when written out
+            sectorial.attrs["percent_format"] = profile.sector_format
+            results[prefix] = sectorial
+
+    except Exception as e:
+        # Retry the groups one by one, where a bad file is logged and skipped
+        # instead of failing every group of the batch
+        logging.error(f"Error processing the sectors in one batch: {str(e)}")
+        results = {}
+        for prefix, files in file_groups.items():
+            try:
+                results[prefix] = process_sectorial_distribution(
+                    files, workbooks[prefix], profile
+                )
+            except Exception as e:
+                logging.error(f"Error processing group {prefix}: {str(e)}")
+        return results
+
+    logging.info(
+        f"Processed 'Sectorial Distribution' for {len(df_list)} files "
+        f"of {len(file_groups)} groups in one batch"
+    )
+    return results
+
+
+def largest_rows(
+    df: pd.DataFrame, column: str, top_n: Optional[int] = None
+) -> pd.DataFrame:
+    """Return the top_n rows of df with the largest column, in descending order.
+
+    Frames of PARTIAL_SELECTION_MIN_ROWS rows or more use a partial selection
+    instead of sorting every row. Rows with a missing value only fill up the
+    places left, as they would after a full sort. With top_n None every row
+    is kept and sorted.
+    """
+    if top_n is None:
+        return df.sort_values(column, ascending=False)
+    if len(df) < PARTIAL_SELECTION_MIN_ROWS:
+        return df.sort_values(column, ascending=False).head(top_n)
+
+    result_df = df.nlargest(top_n, column)
+    if len(result_df) < top_n:
+        missing = df[df[column].isna()].head(top_n - len(result_df))
+        result_df = pd.concat([result_df, missing])
+    return result_df
+
+
+class TopInvestmentsAccumulator:
+    """Running per-ISIN average of the 'Top Investments' sheets.
+
+    Only a sum, a count and the first non-missing metadata are kept per ISIN,
+    so memory grows with the number of distinct holdings, not with the number
+    of files. Sums use the same compensated (Kahan) addition, in the same row
+    order, as pandas' groupby mean, so the result is identical to concatenating
+    every file and grouping by ISIN.
+    """
+
+    def __init__(self) -> None:
+        self.files = 0
+        self.positions: Dict[str, int] = {}  # ISIN -> slot in the arrays below
+        self.sums = np.zeros(0)
+        self.compensations = np.zeros(0)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.metadata = {
+            col: np.empty(0, dtype=object) for col in TOP_INVESTMENTS_METADATA
+        }
+
+    def _grow(self, size: int) -> None:
+        """Make room for ISINs seen for the first time."""
+        extra = size - len(self.sums)
+        if extra <= 0:
+            return
+        self.sums = np.concatenate([self.sums, np.zeros(extra)])
+        self.compensations = np.concatenate([self.compensations, np.zeros(extra)])
+        self.counts = np.concatenate([self.counts, np.zeros(extra, dtype=np.int64)])
+        for col, values in self.metadata.items():
+            missing = np.full(extra, np.nan, dtype=object)
+            self.metadata[col] = np.concatenate([values, missing])
+
+    def add(self, df: pd.DataFrame) -> None:
+        """Fold one cleaned 'Top Investments' frame into the running totals."""
+        self.files += 1
+        positions = self.positions
+        slots = np.fromiter(
+            (positions.setdefault(isin, len(positions)) for isin in df["ISIN"]),
+            dtype=np.int64,
+            count=len(df),
+        )
+        self._grow(len(self.positions))
+
+        # Keep the first non-missing value per ISIN, like groupby "first"
+        for col in TOP_INVESTMENTS_METADATA:
+            values = df[col].to_numpy(dtype=object)
+            fill = pd.isna(self.metadata[col][slots]) & pd.notna(values)
+            new_slots, first_rows = np.unique(slots[fill], return_index=True)
+            self.metadata[col][new_slots] = values[fill][first_rows]
+
+        # An ISIN listed twice in a file is added one occurrence at a time,
+        # so each running sum sees its values in file row order
+        percentages = df["% Assets"].to_numpy(dtype=float)
+        valid = ~np.isnan(percentages)
+        occurrence = pd.Series(slots).groupby(slots).cumcount().to_numpy()
+        for k in range(occurrence.max(initial=-1) + 1):
+            rows = valid & (occurrence == k)
+            isin_slots = slots[rows]
+            y = percentages[rows] - self.compensations[isin_slots]
+            t = self.sums[isin_slots] + y
+            with np.errstate(invalid="ignore"):
+                compensation = t - self.sums[isin_slots] - y
+            # Infinite values make the compensation NaN; pandas resets it to 0
+            compensation[np.isnan(compensation)] = 0
+            self.compensations[isin_slots] = compensation
+            self.sums[isin_slots] = t
+            self.counts[isin_slots] += 1
+
+    def result(self) -> pd.DataFrame:
+        """Return one row per ISIN, ordered by ISIN as groupby("ISIN") does."""
+        isins = np.array(list(self.positions), dtype=object)
+        order = np.argsort(isins, kind="stable")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(self.counts > 0, self.sums / self.counts, np.nan)
+        result_df = pd.DataFrame(
+            {
+                "ISIN": isins[order],
+                "Largest Investments": self.metadata["Largest Investments"][order],
+                "Sector": self.metadata["Sector"][order],
+                "% Assets": means[order],
+                "Country Name": self.metadata["Country Name"][order],
+            }
+        )
+        return result_df.infer_objects()
+
+
+def process_top_investments(
+    files: List[str],
+    workbooks: Optional[Dict[str, Dict[str, pd.DataFrame]]] = None,
+    profile: AveragingProfile = PROFILES["aladdin"],
+) -> pd.DataFrame:
+    """Process 'Top Investments' sheet with averages streamed file by file.
+
+    Only the profile's top_n holdings with the largest average are kept.
+    """
+    if workbooks is None:
+        workbooks = load_workbooks(files)
+
+    accumulator = TopInvestmentsAccumulator()
     for file in files:
         try:
             # Read the Top Investments sheet, skipping the header rows
-            df = pd.read_excel(
+            df = get_sheet(
+                workbooks,
                 file,
-                sheet_name="Top Investments",
-                header=None,
+                "Top Investments",
                 skiprows=4,  # Skip the first 4 rows to get to the data
             )
 
@@ -197,8 +570,11 @@ def process_top_investments(files: List[str]) -> pd.DataFrame:
             ]
 
             # Convert percentage strings to numeric values with high precision
-            df["% Assets"] = pd.to_numeric(
-                df["% Assets"].astype(str).str.rstrip("%"), errors="coerce"
+            df["% Assets"] = (
+                pd.to_numeric(
+                    df["% Assets"].astype(str).str.rstrip("%"), errors="coerce"
+                )
+                / profile.top_investments_divisor
             )
 
             # swap nan for "cash" in column ISIN and "others" in column Sector
@@ -208,53 +584,58 @@ def process_top_investments(files: List[str]) -> pd.DataFrame:
             # Remove any rows where essential data is missing
             df = df.dropna(subset=["Largest Investments"])
 
-            df_list.append(df)
+            accumulator.add(df)
 
         except Exception as e:
             logging.error(f"Error processing file {file}: {str(e)}")
 
-    if not df_list:
+    if not accumulator.files:
         return pd.DataFrame()
 
-    # Combine all dataframes
-    combined_df = pd.concat(df_list, ignore_index=True)
-
-    # Group by ISIN and calculate mean percentage while keeping other information
-    result_df = (
-        combined_df.groupby("ISIN")
-        .agg(
-            {
-                "Largest Investments": "first",
-                "Sector": "first",
-                "% Assets": "mean",
-                "Country Name": "first",
-            }
-        )
-        .reset_index()
-    )
+    # Mean percentage per ISIN, keeping the first name, sector and country seen
+    result_df = accumulator.result()
 
     # Normalize percentages to ensure they sum to 100%
     # total = result_df["% Assets"].sum()
     # result_df["% Assets"] = result_df["% Assets"] / total
 
-    # Sort by percentage in descending order
-    result_df = result_df.sort_values("% Assets", ascending=False)
-
-    # Format percentages with high precision
-    result_df["% Assets"] = result_df["% Assets"].map("{:.2%}".format)
+    # Keep the largest holdings only, in descending order
+    result_df = largest_rows(result_df, "% Assets", profile.top_n)
 
-    # return only first 15 rows
-    result_df = result_df.head(15)
+    # Keep percentages as floats; they are formatted when written out
+    result_df.attrs["percent_format"] = profile.top_investments_format
 
     return result_df
 
 
+def format_percentages(df: pd.DataFrame, column: str = "% Assets") -> pd.DataFrame:
+    """Return a copy of df with column formatted as in the averaged workbooks."""
+    df = df.copy()
+    if column in df.columns and "percent_format" in df.attrs:
+        df[column] = df[column].map(df.attrs["percent_format"].format)
+    return df
+
+
+def parse_percentages(
+    df: pd.DataFrame, percent_format: str, column: str = "% Assets"
+) -> pd.DataFrame:
+    """Turn a formatted percentage column back into floats."""
+    if column in df.columns:
+        df[column] = (
+            pd.to_numeric(df[column].astype(str).str.rstrip("%"), errors="coerce")
+            / 100.0
+        )
+    df.attrs["percent_format"] = percent_format
+    return df
+
+
 def save_results(
     output_file: str,
     post_contractual: pd.DataFrame,
     sectorial: pd.DataFrame,
     top_investments: pd.DataFrame,
     template_file: str,
+    workbooks: Optional[Dict[str, Dict[str, pd.DataFrame]]] = None,
 ) -> None:
     """Save results to a new Excel file."""
     try:
@@ -265,18 +646,26 @@ def save_results(
                 index=False,
                 header=False,
             )
-            sectorial.to_excel(writer, sheet_name="Sectorial Distribution", index=True)
-            top_investments.to_excel(writer, sheet_name="Top Investments", index=False)
-
-            # Copy other sheets from the template file
-            template_sheets = pd.ExcelFile(template_file).sheet_names
-            for sheet_name in template_sheets:
-                if sheet_name not in [
-                    "Post-Contractual Info Data",
-                    "Sectorial Distribution",
-                    "Top Investments",
-                ]:
-                    df_other_sheet = pd.read_excel(template_file, sheet_name=sheet_name)
+            format_percentages(sectorial).to_excel(
+                writer, sheet_name="Sectorial Distribution", index=True
+            )
+            format_percentages(top_investments).to_excel(
+                writer, sheet_name="Top Investments", index=False
+            )
+
+            # Copy other sheets from the template file, reusing the cached
+            # workbook when the caller already opened it
+            if workbooks is not None and template_file in workbooks:
+                other_sheets = workbooks[template_file]
+            else:
+                with pd.ExcelFile(template_file) as xlsx:
+                    other_sheets = {
+                        sheet_name: xlsx.parse(sheet_name)
+                        for sheet_name in xlsx.sheet_names
+                        if sheet_name not in AVERAGED_SHEETS
+                    }
+            for sheet_name, df_other_sheet in other_sheets.items():
+                if sheet_name not in AVERAGED_SHEETS:
                     df_other_sheet.to_excel(writer, sheet_name=sheet_name, index=False)
 
         logging.info(f"Results saved to: {output_file}")
@@ -284,60 +673,608 @@ def save_results(
         logging.error(f"Error saving results to {output_file}: {e}")
 
 
-def process_group(files: List[str]) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    """Process a group of files and return the resulting DataFrames."""
+def post_contractual_table(post_contractual: pd.DataFrame) -> pd.DataFrame:
+    """Turn the header/data rows of process_post_contractual into a typed row.
+
+    Column names come from the header row; every column after the security
+    description holds an averaged float64 value.
+    """
+    headers = [str(header) for header in post_contractual.loc[3]]
+    if len(set(headers)) != len(headers):
+        raise ValueError("Duplicate headers in 'Post-Contractual Info Data'")
+
+    table = pd.DataFrame([list(post_contractual.loc[4])], columns=headers)
+    return table.astype({header: "float64" for header in headers[1:]})
+
+
+def post_contractual_rows(table: pd.DataFrame) -> pd.DataFrame:
+    """Rebuild the header/data rows of process_post_contractual from a typed row."""
+    return pd.DataFrame([list(table.columns), list(table.iloc[0])], index=[3, 4])
+
+
+def _text_columns(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Cast columns to strings for the store, keeping missing values missing."""
+    df = df.copy()
+    for col in columns:
+        if col in df.columns:
+            df[col] = df[col].map(lambda x: x if pd.isna(x) else str(x))
+    return df
+
+
+def save_store(
+    store_dir: str,
+    post_contractual: pd.DataFrame,
+    sectorial: pd.DataFrame,
+    top_investments: pd.DataFrame,
+) -> None:
+    """Save the typed results of a group as Parquet tables in store_dir."""
+    try:
+        os.makedirs(store_dir, exist_ok=True)
+        post_contractual_table(post_contractual).to_parquet(
+            os.path.join(store_dir, STORE_TABLES[0])
+        )
+        sectorial.to_parquet(os.path.join(store_dir, STORE_TABLES[1]))
+        _text_columns(
+            top_investments.reset_index(drop=True),
+            ["ISIN", "Largest Investments", "Sector", "Country Name"],
+        ).to_parquet(os.path.join(store_dir, STORE_TABLES[2]))
+
+        logging.info(f"Results stored in: {store_dir}")
+    except Exception as e:
+        logging.error(f"Error storing results in {store_dir}: {e}")
+
+
+def load_store(store_dir: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Load the results of a group from its Parquet store."""
+    post_contractual = post_contractual_rows(
+        pd.read_parquet(os.path.join(store_dir, STORE_TABLES[0]))
+    )
+    sectorial = pd.read_parquet(os.path.join(store_dir, STORE_TABLES[1]))
+    top_investments = pd.read_parquet(os.path.join(store_dir, STORE_TABLES[2]))
+
+    # Parquet brings missing strings back as None; the workbooks use NaN
+    for df in (sectorial, top_investments):
+        for col in df.select_dtypes(include="object").columns:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+
+    return post_contractual, sectorial, top_investments
+
+
+def store_is_complete(store_dir: str) -> bool:
+    """Check that every table of a group's store has been written."""
+    return all(os.path.exists(os.path.join(store_dir, t)) for t in STORE_TABLES)
+
+
+def load_results(
+    outputs: Dict[str, str], profile: AveragingProfile = PROFILES["aladdin"]
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Reload the DataFrames of a group from its saved outputs.
+
+    The typed Parquet store is preferred; the Excel copy only keeps the
+    formatted percentages, so those are parsed back into floats.
+    """
+    if "parquet" in outputs and store_is_complete(outputs["parquet"]):
+        logging.info(f"Reloaded results from: {outputs['parquet']}")
+        return load_store(outputs["parquet"])
+
+    with pd.ExcelFile(outputs["xlsx"]) as xlsx:
+        post_contractual = xlsx.parse("Post-Contractual Info Data", header=None)
+        sectorial = xlsx.parse("Sectorial Distribution", index_col=0)
+        top_investments = xlsx.parse("Top Investments")
+
+    # Keep the header/data row labels given by process_post_contractual
+    post_contractual.index = [3, 4]
+    sectorial = parse_percentages(sectorial, profile.sector_format)
+    top_investments = parse_percentages(top_investments, profile.top_investments_format)
+
+    logging.info(f"Reloaded results from: {outputs['xlsx']}")
+    return post_contractual, sectorial, top_investments
+
+
+def profile_folder(output_folder: str, profile: AveragingProfile) -> str:
+    """Return the folder of the outputs of a profile's groups."""
+    return os.path.join(output_folder, profile.output_subfolder)
+
+
+def group_outputs(
+    output_folder: str, prefix: str, output_formats: Tuple[str, ...]
+) -> Dict[str, str]:
+    """Return the path of each requested output of a group, keyed by format."""
+    paths = {
+        "xlsx": os.path.join(output_folder, f"average_output_{prefix}.xlsx"),
+        "parquet": os.path.join(output_folder, f"average_output_{prefix}"),
+    }
+    return {output_format: paths[output_format] for output_format in output_formats}
+
+
+def outputs_exist(outputs: Dict[str, str]) -> bool:
+    """Check that every output of a group is on disk."""
+    return all(
+        store_is_complete(path) if output_format == "parquet" else os.path.exists(path)
+        for output_format, path in outputs.items()
+    )
+
+
+def load_manifest(output_folder: str) -> dict:
+    """Load the manifest of the previous run, or an empty one."""
+    manifest_path = os.path.join(output_folder, MANIFEST_FILE)
+    empty_manifest = {"version": MANIFEST_VERSION, "groups": {}}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return empty_manifest
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable manifest {manifest_path}: {e}")
+        return empty_manifest
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        logging.info(f"Manifest version changed, rebuilding every group")
+        return empty_manifest
+    return manifest
+
+
+def save_manifest(output_folder: str, manifest: dict) -> None:
+    """Write the manifest next to the averaged files."""
+    manifest_path = os.path.join(output_folder, MANIFEST_FILE)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    logging.info(f"Manifest saved to: {manifest_path}")
+
+
+def group_is_current(
+    manifest: dict,
+    profile_name: str,
+    prefix: str,
+    inputs: Dict[str, str],
+    outputs: Dict[str, str],
+) -> bool:
+    """Check whether a group's inputs, outputs and profile match the manifest."""
+    entry = manifest["groups"].get(profile_name, {}).get(prefix)
+    return (
+        entry is not None
+        and entry["inputs"] == inputs
+        and entry["settings"] == PROFILES[profile_name]._asdict()
+        and outputs.items() <= entry["outputs"].items()
+        and outputs_exist(outputs)
+    )
+
+
+def process_group(
+    files: List[str],
+    workbooks: Optional[Dict[str, Dict[str, pd.DataFrame]]] = None,
+    sectorial: Optional[pd.DataFrame] = None,
+    profile: AveragingProfile = PROFILES["aladdin"],
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Process a group of files and return the resulting DataFrames.
+
+    sectorial may hold the group's frame from process_sectorial_distributions.
+    """
     logging.info(f"Processing group of files")
 
-    post_contractual = process_post_contractual(files)
-    sectorial = process_sectorial_distribution(files)
-    top_investments = process_top_investments(files)
+    # Open every workbook of the group once for all the sheet processors
+    if workbooks is None:
+        workbooks = load_workbooks(files, template_files=files[:1])
+
+    post_contractual = process_post_contractual(files, workbooks)
+    if sectorial is None:
+        sectorial = process_sectorial_distribution(files, workbooks, profile)
+    top_investments = process_top_investments(files, workbooks, profile)
 
     return post_contractual, sectorial, top_investments
 
 
-def main():
+def average_group(
+    prefix: str,
+    files: List[str],
+    output_folder: str,
+    output_formats: Tuple[str, ...] = OUTPUT_FORMATS,
+    workbooks: Optional[Dict[str, Dict[str, pd.DataFrame]]] = None,
+    sectorial: Optional[pd.DataFrame] = None,
+    profile: AveragingProfile = PROFILES["aladdin"],
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Average one prefix group and save it in the requested output formats.
+
+    The outputs go to the profile's folder within output_folder.
+    """
+    # Open each workbook once; files[0] doubles as the output template
+    if workbooks is None:
+        workbooks = load_workbooks(files, template_files=files[:1])
+
+    # Process each sheet type
+    post_contractual, sectorial, top_investments = process_group(
+        files, workbooks, sectorial, profile
+    )
+
+    outputs = group_outputs(
+        profile_folder(output_folder, profile), prefix, output_formats
+    )
+    if "parquet" in outputs:
+        # Save the typed tables read by the data preparation stage
+        save_store(outputs["parquet"], post_contractual, sectorial, top_investments)
+    if "xlsx" in outputs:
+        # Save results to a new Excel file
+        save_results(
+            outputs["xlsx"],
+            post_contractual,
+            sectorial,
+            top_investments,
+            files[0],
+            workbooks,
+        )
+
+    return post_contractual, sectorial, top_investments
+
+
+def _average_group_in_worker(
+    average_fn: Callable, prefix: str, files: List[str], output_folder: str
+) -> Tuple[Optional[tuple], Optional[str], List[logging.LogRecord]]:
+    """Run average_fn in a pool worker, holding back its log records.
+
+    The records are returned to the parent so the log reads group by group
+    instead of interleaving workers. Every level is held back, as a spawned
+    worker has no logging set up; the parent drops what it does not log.
+    Errors come back as a formatted traceback so one failing group does not
+    hide the others.
+    """
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    root.handlers = [logging.handlers.QueueHandler(records)]
+    root.setLevel(logging.DEBUG)
+    try:
+        result, error = average_fn(prefix, files, output_folder), None
+    except Exception:
+        result, error = None, traceback.format_exc()
+    finally:
+        root.handlers = saved_handlers
+        root.setLevel(saved_level)
+
+    logs = []
+    while not records.empty():
+        logs.append(records.get())
+    return result, error, logs
+
+
+def run_groups_in_pool(
+    file_groups: Dict[str, List[str]],
+    output_folder: str,
+    workers: int,
+    average_fn: Callable = average_group,
+    pool: Optional[ProcessPoolExecutor] = None,
+) -> Tuple[Dict[str, tuple], Dict[str, str]]:
+    """Average independent prefix groups in a process pool.
+
+    Returns the results and the error tracebacks, both keyed by prefix.
+    Worker logs are replayed in group order as each group is collected.
+    A running pool can be passed in to keep its workers warm between calls.
+    """
+    if pool is None:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return run_groups_in_pool(
+                file_groups, output_folder, workers, average_fn, pool
+            )
+
+    results, errors = {}, {}
+    futures = {}
+    for prefix, files in file_groups.items():
+        futures[prefix] = pool.submit(
+            _average_group_in_worker, average_fn, prefix, files, output_folder
+        )
+
+    for prefix, future in futures.items():
+        logging.info(f"Processing group with prefix: {prefix}")
+        result, error, records = future.result()
+        for record in records:
+            logger = logging.getLogger(record.name)
+            if logger.isEnabledFor(record.levelno):
+                logger.handle(record)
+
+        if error is not None:
+            logging.error(f"Group {prefix} failed:\n{error}")
+            errors[prefix] = error
+        else:
+            results[prefix] = result
+
+    return results, errors
+
+
+def shared_key(file: str, shared_length: int) -> str:
+    """Return the file name prefix used to share file reads between profiles."""
+    return os.path.basename(file)[:shared_length].strip()
+
+
+def average_shared_files(
+    key: str,
+    files: List[str],
+    output_folder: str,
+    stale_groups: Dict[str, Dict[str, List[str]]],
+    shared_length: int,
+    output_formats: Tuple[str, ...] = OUTPUT_FORMATS,
+    workbooks: Optional[Dict[str, Dict[str, pd.DataFrame]]] = None,
+    sectorials: Optional[Dict[str, Dict[str, pd.DataFrame]]] = None,
+) -> Dict[str, Dict[str, tuple]]:
+    """Average the stale groups of every profile whose files share a key.
+
+    The files are opened once and their workbooks serve all the profiles.
+    sectorials may hold frames from process_sectorial_distributions, keyed
+    by profile and prefix. Returns the results keyed by profile and prefix.
+    """
+    jobs = [
+        (profile_name, prefix, group)
+        for profile_name, groups in stale_groups.items()
+        for prefix, group in groups.items()
+        if shared_key(group[0], shared_length) == key
+    ]
+    if workbooks is None:
+        workbooks = load_workbooks(
+            files, template_files=[group[0] for _, _, group in jobs]
+        )
+
+    results = {}
+    for profile_name, prefix, group in jobs:
+        logging.info(f"Processing {profile_name} group with prefix: {prefix}")
+        sectorial = (sectorials or {}).get(profile_name, {}).get(prefix)
+        results.setdefault(profile_name, {})[prefix] = average_group(
+            prefix,
+            group,
+            output_folder,
+            output_formats,
+            workbooks,
+            sectorial,
+            PROFILES[profile_name],
+        )
+    return results
+
+
+def average_profiles(
+    profile_names: Iterable[str] = ("aladdin",),
+    workers: int = 1,
+    force: bool = False,
+    output_formats: Tuple[str, ...] = OUTPUT_FORMATS,
+    batch_sectors: bool = False,
+    pool: Optional[ProcessPoolExecutor] = None,
+    skip_reload: AbstractSet[str] = frozenset(),
+) -> Optional[Dict[str, Dict[str, tuple]]]:
+    """Average the input files for several profiles in one pass of reads.
+
+    Returns the results keyed by profile and prefix, or None if the run
+    failed; errors are logged. A running pool is used for the stale groups
+    whatever the number of workers. Unchanged groups whose prefix is in
+    skip_reload, e.g. the ones whose results a caller already holds, map to
+    None instead of being read back from disk.
+    """
     # Define input and output folders
-    input_folder = "excel_books/aladdin_data/aladdin_input"
-    output_folder = "excel_books/aladdin_data/aladdin_data_processed"
+    input_folder = INPUT_FOLDER
+    output_folder = OUTPUT_FOLDER
 
     try:
         # Create output folder and check input folder
         set_up_dir(output_folder, input_folder)
 
-        # Group files by prefix
-        file_groups = group_files(input_folder)
-
-        results = {}  # Store results for each group
-        # Process each group of files
-        for prefix, files in file_groups.items():
-            logging.info(f"Processing group with prefix: {prefix}")
+        # Group files by the prefix of each profile
+        profiles = {name: PROFILES[name] for name in profile_names}
+        folders = {
+            name: profile_folder(output_folder, profile)
+            for name, profile in profiles.items()
+        }
+        for folder in folders.values():
+            os.makedirs(folder, exist_ok=True)
+        file_groups = {
+            name: group_files(input_folder, profile.prefix_length)
+            for name, profile in profiles.items()
+        }
+
+        # Only re-average the groups whose input files or profile changed
+        manifest = load_manifest(output_folder)
+        all_files = {
+            file
+            for groups in file_groups.values()
+            for files in groups.values()
+            for file in files
+        }
+        fingerprints = {file: file_fingerprint(file) for file in all_files}
+        inputs, outputs, stale_groups = {}, {}, {}
+        for name, groups in file_groups.items():
+            inputs[name] = {
+                prefix: {os.path.basename(file): fingerprints[file] for file in files}
+                for prefix, files in groups.items()
+            }
+            outputs[name] = {
+                prefix: group_outputs(folders[name], prefix, output_formats)
+                for prefix in groups
+            }
+            stale_groups[name] = {
+                prefix: files
+                for prefix, files in groups.items()
+                if force
+                or not group_is_current(
+                    manifest, name, prefix, inputs[name][prefix], outputs[name][prefix]
+                )
+            }
+            logging.info(
+                f"{name}: {len(stale_groups[name])} of {len(groups)} groups need "
+                "averaging" + (" (forced)" if force else "")
+            )
 
-            prefix = prefix.strip()  # Remove any leading/trailing spaces
-            # Process each sheet type
-            post_contractual, sectorial, top_investments = process_group(files)
+        # Every group of every profile lies within the files sharing its
+        # shortest prefix, so each of these sets is opened only once
+        shared_length = min(profile.prefix_length for profile in profiles.values())
+        shared_files = {}
+        for groups in stale_groups.values():
+            for files in groups.values():
+                key = shared_key(files[0], shared_length)
+                shared_files.setdefault(key, {}).update(dict.fromkeys(files))
+        shared_files = {key: list(files) for key, files in shared_files.items()}
+        average_fn = partial(
+            average_shared_files,
+            stale_groups=stale_groups,
+            shared_length=shared_length,
+            output_formats=output_formats,
+        )
 
-            # Save results to a new Excel file
-            output_file = os.path.join(output_folder, f"average_output_{prefix}.xlsx")
-            save_results(
-                output_file, post_contractual, sectorial, top_investments, files[0]
+        rebuilt = {name: {} for name in profiles}
+        try:
+            if pool is not None or (workers > 1 and len(shared_files) > 1):
+                if batch_sectors:
+                    logging.warning("Batched sectors need --workers 1; not batching")
+                logging.info(f"Processing {len(shared_files)} file sets in a pool")
+                shared_results, errors = run_groups_in_pool(
+                    shared_files, output_folder, workers, average_fn, pool
+                )
+                for results in shared_results.values():
+                    for name, groups in results.items():
+                        rebuilt[name].update(groups)
+                if errors:
+                    raise RuntimeError(
+                        f"{len(errors)} file set(s) failed: {list(errors)}"
+                    )
+            else:
+                workbooks = {}
+                sectorials = {}
+                if batch_sectors:
+                    # Open every stale file up front to average all sectors at once
+                    template_files = [
+                        files[0]
+                        for groups in stale_groups.values()
+                        for files in groups.values()
+                    ]
+                    workbooks = {
+                        key: load_workbooks(files, template_files)
+                        for key, files in shared_files.items()
+                    }
+                    all_workbooks = {}
+                    for key_workbooks in workbooks.values():
+                        all_workbooks.update(key_workbooks)
+                    sectorials = {
+                        name: process_sectorial_distributions(
+                            groups,
+                            {prefix: all_workbooks for prefix in groups},
+                            profiles[name],
+                        )
+                        for name, groups in stale_groups.items()
+                    }
+
+                # Process the groups of each set of files
+                for key, files in shared_files.items():
+                    results = average_fn(
+                        key,
+                        files,
+                        output_folder,
+                        workbooks=workbooks.pop(key, None),
+                        sectorials=sectorials,
+                    )
+                    for name, groups in results.items():
+                        rebuilt[name].update(groups)
+        finally:
+            # Record the groups that did get rebuilt, even if another failed
+            manifest.setdefault("last_rebuilt", {})
+            for name, profile in profiles.items():
+                entries = {
+                    prefix: entry
+                    for prefix, entry in manifest["groups"].get(name, {}).items()
+                    if prefix in file_groups[name]
+                }
+                for prefix in rebuilt[name]:
+                    if outputs_exist(outputs[name][prefix]):
+                        entries[prefix] = {
+                            "inputs": inputs[name][prefix],
+                            "outputs": outputs[name][prefix],
+                            "settings": profile._asdict(),
+                        }
+                manifest["groups"][name] = entries
+                manifest["last_rebuilt"][name] = sorted(rebuilt[name])
+            save_manifest(output_folder, manifest)
+
+        # Reload the cached results of the unchanged groups
+        all_results = {}
+        for name, profile in profiles.items():
+            results = {}  # Store results for each group
+            for prefix in file_groups[name]:
+                if prefix in rebuilt[name]:
+                    results[prefix] = rebuilt[name][prefix]
+                elif prefix in skip_reload:
+                    results[prefix] = None
+                else:
+                    results[prefix] = load_results(outputs[name][prefix], profile)
+            all_results[name] = results
+
+            logging.info(
+                f"{name}: rebuilt {len(rebuilt[name])} group(s): "
+                f"{sorted(rebuilt[name])}"
+            )
+            logging.info(
+                f"{name}: reused {len(results) - len(rebuilt[name])} unchanged group(s)"
             )
-
-            # Store results in a dictionary
-            results[prefix] = (post_contractual, sectorial, top_investments)
 
         logging.info("Processing complete.")
-        return results
+        return all_results
 
     except Exception as e:
         logging.error(f"An error occurred during processing: {e}")
         # add more detailed error information
-        import traceback
-
         logging.error(traceback.format_exc())
 
 
+def main(
+    workers: int = 1,
+    force: bool = False,
+    output_formats: Tuple[str, ...] = OUTPUT_FORMATS,
+    batch_sectors: bool = False,
+):
+    """Average the Aladdin files and return their results keyed by prefix."""
+    results = average_profiles(
+        ["aladdin"], workers, force, output_formats, batch_sectors
+    )
+    if results is not None:
+        return results["aladdin"]
+
+
 if __name__ == "__main__":
-    main()
+    # Set up logging
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
 
-# Example usage:
-main()
+    parser = argparse.ArgumentParser(description="Average monthly Aladdin files")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes used to average the fund groups (default: 1)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="re-average every group, even if its input files are unchanged",
+    )
+    parser.add_argument(
+        "--formats",
+        nargs="+",
+        choices=EXCEL_OUTPUT_FORMATS,
+        default=list(OUTPUT_FORMATS),
+        help="outputs to write per group: the typed Parquet store read by data "
+        "prep and/or the Excel copy (default: parquet)",
+    )
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        choices=list(PROFILES),
+        default=["aladdin"],
+        help="fund families to average, sharing one read of the input files "
+        "(default: aladdin)",
+    )
+    parser.add_argument(
+        "--batch-sectors",
+        action="store_true",
+        help="average the sector sheets of all groups in one batch; keeps every "
+        "stale workbook in memory and needs --workers 1",
+    )
+    args = parser.parse_args()
+    average_profiles(
+        args.profiles,
+        workers=args.workers,
+        force=args.force,
+        output_formats=tuple(args.formats),
+        batch_sectors=args.batch_sectors,
+    )
@@ -0,0 +1,181 @@
+import argparse
+import datetime
+import importlib
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from aladdin_average_generator import (
+    EXCEL_OUTPUT_FORMATS,
+    INPUT_FOLDER,
+    OUTPUT_FOLDER,
+    OUTPUT_FORMATS,
+    average_profiles,
+    load_manifest,
+)
+
+# The data prep script name starts with a digit, so import it by name
+data_preper = importlib.import_module("00_data_preper")
+
+# Run from the project folder, like aladdin_average_generator:
+#
+#     python python_scripts/aladdin_watcher.py --workers 4
+#
+# Every monthly file that lands in the input folder re-averages its fund
+# group and refreshes the final processed data, without a full batch run.
+
+
+def snapshot(input_folder: str) -> Dict[str, Tuple[int, int]]:
+    """Return the size and modification time of each .xlsx in input_folder.
+
+    Excel lock files (~$name.xlsx) of workbooks still open are skipped.
+    """
+    files = {}
+    with os.scandir(input_folder) as entries:
+        for entry in entries:
+            if entry.name.endswith(".xlsx") and not entry.name.startswith("~$"):
+                stat = entry.stat()
+                files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def refresh(
+    rows: Dict[str, pd.DataFrame],
+    pool: Optional[ProcessPoolExecutor],
+    excel: bool = False,
+) -> bool:
+    """Re-average the changed groups and save the updated final data.
+
+    rows holds the data prep row of every fund by prefix; the groups rebuilt
+    by this run, and the unchanged ones without a row (e.g. their data prep
+    failed last time), are passed through data prep again. With excel the
+    averages and the final data also get their Excel copies. Returns False if
+    the averaging failed, so the caller can retry.
+    """
+    results = average_profiles(
+        ["aladdin"],
+        output_formats=EXCEL_OUTPUT_FORMATS if excel else OUTPUT_FORMATS,
+        pool=pool,
+        skip_reload=set(rows),
+    )
+    if results is None:
+        # The groups rebuilt before the failure are current on disk now, so
+        # their rows are dropped to read them back on the next refresh
+        manifest = load_manifest(OUTPUT_FOLDER)
+        for prefix in manifest.get("last_rebuilt", {}).get("aladdin", []):
+            rows.pop(prefix, None)
+        return False
+    results = results["aladdin"]
+
+    # Forget the funds whose files are gone, rebuild the rows of the others
+    for prefix in set(rows) - set(results):
+        logging.info(f"Dropping {prefix}, its files were removed")
+        del rows[prefix]
+    for prefix, tables in results.items():
+        if tables is None:
+            continue
+        try:
+            logging.info(f"Processing {prefix}")
+            rows[prefix] = data_preper.build_processed_frame(
+                *data_preper.load_results_tables(*tables)
+            )
+        except Exception as e:
+            logging.error(f"Error processing {prefix}: {str(e)}")
+            logging.error("Full traceback:", exc_info=True)
+            rows.pop(prefix, None)
+
+    if not rows:
+        logging.error("No processed funds to save")
+        return True
+
+    result_df = pd.concat([rows[prefix] for prefix in sorted(rows)], ignore_index=True)
+    data_preper.save_processed_data(
+        data_preper.finalize_processed_data(result_df),
+        datetime.datetime.now().strftime("%Y%m%d"),
+        excel=excel,
+    )
+    return True
+
+
+def watch(interval: float, settle: float, workers: int, excel: bool = False) -> None:
+    """Poll the input folder and refresh the outputs after each drop of files.
+
+    A change is handled once the folder has been still for settle seconds,
+    so files that are still being copied are not read half-written. The
+    process pool, if any, stays up between changes.
+    """
+    logging.info(f"Watching {INPUT_FOLDER} every {interval}s")
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    rows = {}  # data prep row of each fund, by prefix
+    try:
+        # Catch up with the files that arrived while nobody was watching
+        seen = snapshot(INPUT_FOLDER)
+        pending_since = None if refresh(rows, pool, excel) else time.monotonic()
+
+        while True:
+            time.sleep(interval)
+            current = snapshot(INPUT_FOLDER)
+            if current != seen:
+                changed = {
+                    name
+                    for name in current.keys() | seen.keys()
+                    if current.get(name) != seen.get(name)
+                }
+                logging.info(f"Detected changes in: {sorted(changed)}")
+                seen = current
+                pending_since = time.monotonic()
+                continue
+
+            if pending_since is not None and time.monotonic() - pending_since >= settle:
+                if refresh(rows, pool, excel):
+                    pending_since = None
+                else:
+                    # Retry later, e.g. when a file was not complete yet
+                    logging.warning(f"Refresh failed, retrying in {settle}s")
+                    pending_since = time.monotonic()
+
+    except KeyboardInterrupt:
+        logging.info("Stopped watching")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    # Set up logging
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Re-average and re-prepare Aladdin files as they arrive"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=2.0,
+        help="seconds between two looks at the input folder (default: 2)",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=5.0,
+        help="seconds without changes before new files are read (default: 5)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of warm processes used to average the groups (default: 1)",
+    )
+    parser.add_argument(
+        "--excel",
+        action="store_true",
+        help="also save the averages and the final processed data as Excel copies",
+    )
+    args = parser.parse_args()
+    watch(args.interval, args.settle, args.workers, args.excel)
@@ -0,0 +1,160 @@
+"""Typed snapshot of the BBDD sheet, shared by every stage.
+
+bbdd_sfdr_wip.xlsx is a static reference table, so it is parsed with openpyxl
+once per version of the file: the validated table is cached as Parquet under
+bbdd_cache/, keyed by the SHA-256 of the workbook, and kept in memory for the
+rest of the process.
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from fingerprints import file_fingerprint
+
+BBDD_FILE = (
+    Path.home()
+    / "Documents"
+    / "sfdr_report_generator"
+    / "excel_books"
+    / "bbdd_sfdr_wip.xlsx"
+)
+
+# Columns every stage relies on
+REQUIRED_COLUMNS = ["aladdin_code", "{{product_name}}", "language", "narrative"]
+
+# Part of the cache key, bumped whenever the snapshot layout changes
+SNAPSHOT_VERSION = 1
+
+# Snapshots loaded by this process, by workbook fingerprint
+_SNAPSHOTS: Dict[str, "BBDDSnapshot"] = {}
+
+
+def code_key(code: str) -> str:
+    """Normalize an aladdin_code / security_description for lookups."""
+    return str(code).strip().upper()
+
+
+def product_key(name: str) -> str:
+    """Normalize a product name, with or without underscores, for lookups."""
+    return str(name).strip().replace(" ", "_")
+
+
+class BBDDSnapshot:
+    """The BBDD table with indexed lookups by fund code and product name.
+
+    When a code or product name appears more than once, lookups return its
+    last row, as the report name mappings always did.
+    """
+
+    def __init__(self, table: pd.DataFrame):
+        self.table = table
+        self._by_code = {
+            key: position
+            for position, key in enumerate(table["aladdin_code"].map(code_key))
+        }
+        self._by_product = {
+            key: position
+            for position, key in enumerate(table["{{product_name}}"].map(product_key))
+        }
+
+    def merge_table(self) -> pd.DataFrame:
+        """Return a copy of the table keyed by security_description for merges."""
+        return self.table.rename(columns={"aladdin_code": "security_description"})
+
+    def by_code(self, code: str) -> Optional[pd.Series]:
+        """Return the row of an aladdin_code or security_description."""
+        position = self._by_code.get(code_key(code))
+        return None if position is None else self.table.iloc[position]
+
+    def by_product(self, name: str) -> Optional[pd.Series]:
+        """Return the row of a product name or of its underscored report name."""
+        position = self._by_product.get(product_key(name))
+        return None if position is None else self.table.iloc[position]
+
+    def product_codes(self) -> Dict[str, str]:
+        """Map each underscored product name to its normalized aladdin_code."""
+        codes = self.table["aladdin_code"].map(code_key).to_numpy()
+        return {key: codes[position] for key, position in self._by_product.items()}
+
+
+def validate_bbdd(table: pd.DataFrame, source: Path) -> pd.DataFrame:
+    """Check the BBDD sheet and type it for the snapshot.
+
+    Text columns are stored as strings, keeping missing values missing, so
+    mixed cells survive Parquet; numeric and date columns keep their types.
+    """
+    missing = [col for col in REQUIRED_COLUMNS if col not in table.columns]
+    if missing:
+        raise ValueError(f"BBDD {source} is missing the columns {missing}")
+    if table.columns.duplicated().any():
+        duplicated = sorted(set(table.columns[table.columns.duplicated()]))
+        raise ValueError(f"BBDD {source} has duplicate columns {duplicated}")
+    if table["aladdin_code"].isna().any():
+        raise ValueError(f"BBDD {source} has rows without aladdin_code")
+
+    duplicated_codes = table["aladdin_code"].map(code_key)
+    duplicated_codes = sorted(set(duplicated_codes[duplicated_codes.duplicated()]))
+    if duplicated_codes:
+        logging.warning(f"BBDD {source} repeats the codes {duplicated_codes}")
+
+    table = table.copy()
+    for col in table.select_dtypes(include="object").columns:
+        table[col] = table[col].map(lambda x: x if pd.isna(x) else str(x))
+    return table
+
+
+def snapshot_path(source: Path, fingerprint: str) -> Path:
+    """Return the cache file of a version of the BBDD workbook."""
+    file_name = f"{source.stem}_v{SNAPSHOT_VERSION}_{fingerprint}.parquet"
+    return source.parent / "bbdd_cache" / file_name
+
+
+def read_snapshot(cache_file: Path) -> pd.DataFrame:
+    """Read a cached snapshot back with the missing values of read_excel."""
+    table = pd.read_parquet(cache_file)
+    # Parquet brings missing strings back as None; read_excel gives NaN
+    for col in table.select_dtypes(include="object").columns:
+        table[col] = table[col].where(table[col].notna(), np.nan)
+    return table
+
+
+def save_snapshot(table: pd.DataFrame, source: Path, cache_file: Path) -> None:
+    """Cache a snapshot and drop those of older versions of the workbook."""
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        for old_file in cache_file.parent.glob(f"{source.stem}_v*_*.parquet"):
+            old_file.unlink()
+        table.to_parquet(cache_file)
+        logging.info(f"BBDD snapshot cached in: {cache_file}")
+    except Exception as e:
+        # The snapshot is only a cache, the run can go on without it
+        logging.warning(f"Could not cache the BBDD snapshot in {cache_file}: {e}")
+
+
+def load_bbdd(source=BBDD_FILE) -> BBDDSnapshot:
+    """Return the snapshot of the BBDD workbook, parsing it only if it changed."""
+    source = Path(source)
+    fingerprint = file_fingerprint(str(source))
+    if fingerprint in _SNAPSHOTS:
+        return _SNAPSHOTS[fingerprint]
+
+    cache_file = snapshot_path(source, fingerprint)
+    table = None
+    if cache_file.exists():
+        try:
+            table = read_snapshot(cache_file)
+            logging.info(f"BBDD loaded from snapshot: {cache_file}")
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable BBDD snapshot {cache_file}: {e}")
+
+    if table is None:
+        table = validate_bbdd(pd.read_excel(source, engine="openpyxl"), source)
+        save_snapshot(table, source, cache_file)
+        logging.info(f"BBDD loaded from: {source}")
+
+    _SNAPSHOTS[fingerprint] = BBDDSnapshot(table)
+    return _SNAPSHOTS[fingerprint]
@@ -0,0 +1,684 @@
+"""Micro-benchmarks for the slow steps of the SFDR pipeline.
+
+Run from the python_scripts folder, e.g.:
+
+    python benchmarks.py post_contractual
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+from bs4 import BeautifulSoup
+
+import bbdd_snapshot
+import fingerprints
+import plot_builder
+from aladdin_average_generator import (
+    format_percentages,
+    largest_rows,
+    parse_numeric_block,
+    process_sectorial_distribution,
+    process_sectorial_distributions,
+    TopInvestmentsAccumulator,
+)
+from derived_metrics import ALIGNED_COLUMNS, derive_metrics, PERCENT_COLUMNS
+from html_renderer import render_table
+from processed_data_store import (
+    load_processed_store,
+    METRIC_COLUMNS,
+    save_processed_store,
+    TEXT_COLUMNS,
+)
+from translation_catalog import get_catalog, load_translations
+
+# The template builder's name starts with a digit, so import it by name
+template_builder = importlib.import_module("01_template_builder")
+
+
+def best_of(func: Callable, repeat: int = 5) -> float:
+    """Return the best wall-clock time of func over a few runs, in ms."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def make_post_contractual_rows(n_files: int, n_columns: int = 80) -> List[pd.DataFrame]:
+    """Build data rows shaped like the 'Post-Contractual Info Data' sheet."""
+    rng = random.Random(0)
+    rows = []
+    for _ in range(n_files):
+        cells = ["FIG05240"]
+        for _ in range(n_columns):
+            kind = rng.random()
+            if kind < 0.4:
+                cells.append(f"{rng.uniform(0, 100):.2f}%")
+            elif kind < 0.5:
+                cells.append(f"{rng.uniform(1000, 99999):,.2f}")
+            elif kind < 0.6:
+                cells.append(np.nan)
+            else:
+                cells.append(rng.random())
+        # One row per file, dtypes inferred per cell as pd.read_excel does
+        rows.append(pd.DataFrame([cells]))
+    return rows
+
+
+def post_contractual_per_file(rows: List[pd.DataFrame]) -> np.ndarray:
+    """The former per-file, per-column parsing of process_post_contractual."""
+    values_list = []
+    for df in rows:
+        df = df.copy()
+        for col in df.columns:
+            if df[col].dtype == object:
+                df[col] = df[col].astype(str).str.rstrip("%").str.replace(",", "")
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+        df = df.fillna(0)
+        values_list.append(df.iloc[:, 1:].values[0])
+    return np.mean(values_list, axis=0)
+
+
+def post_contractual_batch(rows: List[pd.DataFrame]) -> np.ndarray:
+    """The batch parsing of process_post_contractual."""
+    block = np.vstack([df.iloc[0, 1:].to_numpy(dtype=object) for df in rows])
+    return parse_numeric_block(block).mean(axis=0)
+
+
+def bench_post_contractual() -> None:
+    """Per-file vs batch parsing of the post-contractual data rows."""
+    print(f"{'files':>6} {'per-file ms':>12} {'batch ms':>10} {'speedup':>8}")
+    for n_files in (1, 12, 120):
+        rows = make_post_contractual_rows(n_files)
+        np.testing.assert_array_equal(
+            post_contractual_per_file(rows), post_contractual_batch(rows)
+        )
+
+        per_file = best_of(lambda: post_contractual_per_file(rows))
+        batch = best_of(lambda: post_contractual_batch(rows))
+        print(
+            f"{n_files:>6} {per_file:>12.2f} {batch:>10.2f} {per_file / batch:>7.1f}x"
+        )
+
+
+def peak_memory(func: Callable) -> float:
+    """Return the peak memory traced while running func, in MB."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def make_top_investments(n_holdings: int, seed: int) -> pd.DataFrame:
+    """Build one cleaned 'Top Investments' snapshot of a bond fund."""
+    rng = np.random.default_rng(seed)
+    isins = rng.choice(int(n_holdings * 1.2), n_holdings, replace=False)
+    return pd.DataFrame(
+        {
+            "ISIN": [f"XS{isin:010d}" for isin in isins],
+            "Largest Investments": [f"Bond {isin}" for isin in isins],
+            "Sector": rng.choice(["Government", "Financials", "Energy"], n_holdings),
+            "% Assets": rng.random(n_holdings) / n_holdings,
+            "Country Name": rng.choice(["Spain", "France", "Italy"], n_holdings),
+        }
+    )
+
+
+def top_investments_concat(n_files: int, n_holdings: int) -> pd.DataFrame:
+    """The former concat-then-groupby averaging of process_top_investments."""
+    frames = [make_top_investments(n_holdings, seed) for seed in range(n_files)]
+    combined_df = pd.concat(frames, ignore_index=True)
+    return (
+        combined_df.groupby("ISIN")
+        .agg(
+            {
+                "Largest Investments": "first",
+                "Sector": "first",
+                "% Assets": "mean",
+                "Country Name": "first",
+            }
+        )
+        .reset_index()
+    )
+
+
+def top_investments_streaming(n_files: int, n_holdings: int) -> pd.DataFrame:
+    """The streaming averaging of process_top_investments."""
+    accumulator = TopInvestmentsAccumulator()
+    for seed in range(n_files):
+        accumulator.add(make_top_investments(n_holdings, seed))
+    return accumulator.result()
+
+
+def bench_top_investments() -> None:
+    """Peak memory of concat-then-groupby vs streaming Top Investments."""
+    n_holdings = 2000
+    print(f"{'files':>6} {'concat MB':>10} {'streaming MB':>13}")
+    for n_files in (20, 60, 250):
+        pd.testing.assert_frame_equal(
+            top_investments_concat(n_files, n_holdings),
+            top_investments_streaming(n_files, n_holdings),
+        )
+
+        concat = peak_memory(lambda: top_investments_concat(n_files, n_holdings))
+        streaming = peak_memory(lambda: top_investments_streaming(n_files, n_holdings))
+        print(f"{n_files:>6} {concat:>10.1f} {streaming:>13.1f}")
+
+
+def bench_top_n() -> None:
+    """Sort and format every holding vs select and format the top 15."""
+    print(f"{'holdings':>8} {'sort+format ms':>15} {'top-n ms':>9} {'speedup':>8}")
+    for n_holdings in (1_000, 20_000, 50_000, 100_000):
+        df = make_top_investments(n_holdings, seed=0)
+        df.attrs["percent_format"] = "{:.2%}"
+
+        def sort_all():
+            result_df = df.sort_values("% Assets", ascending=False)
+            result_df["% Assets"] = result_df["% Assets"].map("{:.2%}".format)
+            return result_df.head(15)
+
+        def top_n():
+            return format_percentages(largest_rows(df, "% Assets", 15))
+
+        pd.testing.assert_frame_equal(sort_all(), top_n(), check_flags=False)
+
+        sort_ms, top_ms = best_of(sort_all), best_of(top_n)
+        print(
+            f"{n_holdings:>8} {sort_ms:>15.2f} {top_ms:>9.2f} {sort_ms / top_ms:>7.1f}x"
+        )
+
+
+SECTORS = [
+    "Financials",
+    "Government",
+    "Industrials",
+    "Utilities",
+    "Energy",
+    "Health Care",
+    "Information Technology",
+    "Consumer Staples",
+    "Materials",
+    "Real Estate",
+    "Cash and Derivatives",
+]
+
+
+def make_sector_workbooks(n_groups: int, n_files: int = 12) -> tuple:
+    """Build load_workbooks caches holding only 'Sectorial Distribution' sheets."""
+    rng = np.random.default_rng(0)
+    file_groups, workbooks = {}, {}
+    for group in range(n_groups):
+        prefix = f"EPV{group:05d}_"
+        file_groups[prefix] = [f"{prefix}{month:02d}.xlsx" for month in range(n_files)]
+        workbooks[prefix] = {}
+        for file in file_groups[prefix]:
+            n_rows = rng.integers(5, 25)
+            cells = [[None, None, None]] * 5 + [
+                [None, rng.choice(SECTORS), f"{rng.uniform(0, 20):.2f}%"]
+                for _ in range(n_rows)
+            ]
+            workbooks[prefix][file] = {"Sectorial Distribution": pd.DataFrame(cells)}
+    return file_groups, workbooks
+
+
+def bench_sectors() -> None:
+    """Per-group vs batched 'Sectorial Distribution' averaging."""
+    print(f"{'groups':>6} {'per-group ms':>13} {'batch ms':>10} {'speedup':>8}")
+    for n_groups in (10, 50, 200):
+        file_groups, workbooks = make_sector_workbooks(n_groups)
+
+        def per_group():
+            return {
+                prefix: process_sectorial_distribution(files, workbooks[prefix])
+                for prefix, files in file_groups.items()
+            }
+
+        def batch():
+            return process_sectorial_distributions(file_groups, workbooks)
+
+        expected, result = per_group(), batch()
+        for prefix in file_groups:
+            assert list(expected[prefix].index) == list(result[prefix].index)
+            np.testing.assert_allclose(
+                expected[prefix]["% Assets"], result[prefix]["% Assets"], rtol=1e-12
+            )
+
+        per_group_ms = best_of(per_group, repeat=3)
+        batch_ms = best_of(batch, repeat=3)
+        speedup = per_group_ms / batch_ms
+        print(f"{n_groups:>6} {per_group_ms:>13.1f} {batch_ms:>10.1f} {speedup:>7.1f}x")
+
+
+def make_report_tables(n_tables: int) -> List[pd.DataFrame]:
+    """Build translated top investment tables as data prep hands them over."""
+    rng = np.random.default_rng(0)
+    tables = []
+    for _ in range(n_tables):
+        isins = rng.choice(10_000, 15, replace=False)
+        tables.append(
+            pd.DataFrame(
+                {
+                    "Inversiones más importantes": [
+                        f"Bond {isin} & Co" if isin % 7 == 0 else f"Bond {isin}"
+                        for isin in isins
+                    ],
+                    "Sector": rng.choice(SECTORS, 15),
+                    "% de activos": [f"{x:.2%}" for x in rng.random(15) / 15],
+                    "País": rng.choice(["España", "Francia", "Italia"], 15),
+                },
+                dtype=object,
+            )
+        )
+    return tables
+
+
+def soup_table(df: pd.DataFrame) -> str:
+    """Write a report table as before: to_html, reparsed for its <tbody>."""
+    html_str = df.to_html(classes="dataframe", index=False, escape=False)
+    tbody = str(BeautifulSoup(html_str, "html.parser").find("tbody"))
+    cols = "".join(
+        f'\n                <col class="col{i}">' for i in range(1, len(df.columns) + 1)
+    )
+    colgroup = f"""
+            <colgroup>{cols}
+            </colgroup>
+        """
+    return f"""
+        <table>
+            {colgroup}
+            <thead>
+                <tr>
+                    {"".join(f"<th>{col}</th>" for col in df.columns)}
+                </tr>
+            </thead>
+            {tbody}
+        </table>
+    """
+
+
+def bench_html_tables() -> None:
+    """to_html + BeautifulSoup vs direct rendering of the whole tables."""
+    print(f"{'tables':>6} {'soup ms':>10} {'direct ms':>10} {'speedup':>8}")
+    for n_tables in (10, 100, 500):
+        tables = make_report_tables(n_tables)
+        for df in tables:
+            assert render_table(df) == soup_table(df)
+
+        soup_ms = best_of(lambda: [soup_table(df) for df in tables], repeat=3)
+        direct_ms = best_of(lambda: [render_table(df) for df in tables], repeat=3)
+        speedup = soup_ms / direct_ms
+        print(f"{n_tables:>6} {soup_ms:>10.1f} {direct_ms:>10.1f} {speedup:>7.1f}x")
+
+
+def bench_translation() -> None:
+    """Per-cell dictionary lookups vs the catalog, on the sector columns."""
+    translations = load_translations()
+    catalog = get_catalog("es")
+    print(f"{'cells':>8} {'per-cell ms':>12} {'catalog ms':>11} {'speedup':>8}")
+    for n_cells in (1_000, 10_000, 100_000):
+        values = pd.Series(np.random.default_rng(0).choice(SECTORS, n_cells))
+
+        def per_cell():
+            return values.apply(
+                lambda x: (
+                    translations.get("es", {}).get(str(x), str(x))
+                    if pd.notnull(x)
+                    else x
+                )
+            )
+
+        pd.testing.assert_series_equal(per_cell(), catalog.translate_series(values))
+
+        per_cell_ms = best_of(per_cell)
+        catalog_ms = best_of(lambda: catalog.translate_series(values))
+        speedup = per_cell_ms / catalog_ms
+        print(f"{n_cells:>8} {per_cell_ms:>12.2f} {catalog_ms:>11.2f} {speedup:>7.1f}x")
+    catalog.take_misses()
+
+
+def bench_bbdd() -> None:
+    """openpyxl read of the BBDD vs its cached snapshot, per process and warm."""
+    source = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "excel_books",
+        "bbdd_sfdr_wip.xlsx",
+    )
+    with tempfile.TemporaryDirectory() as folder:
+        bbdd_file = shutil.copy(source, folder)
+
+        def new_process():
+            # What a fresh process finds: no hash nor snapshot in memory
+            fingerprints._FINGERPRINTS.clear()
+            bbdd_snapshot._SNAPSHOTS.clear()
+            return bbdd_snapshot.load_bbdd(bbdd_file)
+
+        excel_df = pd.read_excel(bbdd_file)
+        typed_df = bbdd_snapshot.validate_bbdd(excel_df, bbdd_file)
+        pd.testing.assert_frame_equal(typed_df, new_process().table)  # parsed
+        pd.testing.assert_frame_equal(typed_df, new_process().table)  # cached
+
+        excel_ms = best_of(lambda: pd.read_excel(bbdd_file), repeat=3)
+        snapshot_ms = best_of(new_process)
+        warm_ms = best_of(lambda: bbdd_snapshot.load_bbdd(bbdd_file))
+    print(f"{'rows':>6} {'excel ms':>9} {'snapshot ms':>12} {'warm ms':>8}")
+    print(f"{len(excel_df):>6} {excel_ms:>9.1f} {snapshot_ms:>12.1f} {warm_ms:>8.2f}")
+
+
+def make_processed_data(n_funds: int) -> pd.DataFrame:
+    """Build a final processed data frame, its tables left in side files."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        rng.random((n_funds, len(METRIC_COLUMNS))) * 100, columns=METRIC_COLUMNS
+    )
+    for col in TEXT_COLUMNS:
+        df[col] = [f"{col} {i}" for i in range(n_funds)]
+    return df
+
+
+def bench_processed_data() -> None:
+    """Excel vs typed Parquet handoff of the final processed data, write + read."""
+    print(f"{'funds':>6} {'excel ms':>9} {'parquet ms':>11} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        excel_file = os.path.join(folder, "final_processed_data.xlsx")
+        store_file = os.path.join(folder, "final_processed_data.parquet")
+        for n_funds in (50, 200):
+            df = make_processed_data(n_funds)
+
+            def excel_handoff():
+                df.to_excel(excel_file, index=False)
+                return pd.read_excel(excel_file)
+
+            def store_handoff():
+                save_processed_store(df, store_file)
+                return load_processed_store(store_file)
+
+            pd.testing.assert_frame_equal(excel_handoff(), store_handoff())
+
+            excel_ms = best_of(excel_handoff, repeat=3)
+            store_ms = best_of(store_handoff, repeat=3)
+            speedup = excel_ms / store_ms
+            print(f"{n_funds:>6} {excel_ms:>9.1f} {store_ms:>11.1f} {speedup:>7.1f}x")
+
+
+def make_share_classes(n_rows: int) -> pd.DataFrame:
+    """Build merged fund rows, with ESG scores on and around the grade bands."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "security_description": [f"FUND{i:06d}" for i in range(n_rows)],
+            "{{product_name}}": [f"Fund {i}" for i in range(n_rows)],
+        }
+    )
+    for col in PERCENT_COLUMNS:
+        df[col] = rng.random(n_rows)
+    for col in ALIGNED_COLUMNS:
+        df[col] = rng.random(n_rows) * 100
+    scores = rng.uniform(40, 95, n_rows)
+    scores[:8] = [55, 65, 80, np.nan, np.inf, -np.inf, 55.0001, 80.0001]
+    df["{{esg_score_2024}}"] = scores
+    df.iloc[8:20, 2] = np.nan
+    return df
+
+
+def transform_esg_score(average_score: float) -> str:
+    """The former per-row ESG grade of data prep."""
+    logging.debug(f"Transforming score: {average_score}")
+    average_score = float(average_score)
+    if average_score > 80:
+        return "A+"
+    elif 65 < average_score <= 80:
+        return "A"
+    elif 55 < average_score <= 65:
+        return "A-"
+    else:
+        return "B"
+
+
+def derive_metrics_per_column(result_df: pd.DataFrame) -> pd.DataFrame:
+    """The former column by column derivation of finalize_processed_data."""
+    result_df = result_df.copy()
+    result_df[PERCENT_COLUMNS] *= 100
+    result_df["{{other_nones}}"] = 100 - result_df["{{es_aligned}}"]
+    result_df["{{other_non_sust}}"] = (
+        result_df["{{es_aligned}}"] - result_df["{{sust_invest}}"]
+    )
+    for col in ["capex", "opex", "turnover"]:
+        result_df[f"rest_{col}_aligned"] = 100 - result_df[f"total_{col}_aligned"]
+        result_df[f"rest_{col}_aligned_exsovereign"] = (
+            100 - result_df[f"total_{col}_aligned_exsovereign"]
+        )
+    result_df["{{esg_score_2024}}"] = result_df["{{esg_score_2024}}"].apply(
+        transform_esg_score
+    )
+    for col in result_df.select_dtypes(include=["float64", "int64"]).columns:
+        result_df[col] = result_df[col].round(2)
+    return result_df
+
+
+def bench_derived_metrics() -> None:
+    """Column by column with a per-row ESG grade vs the vectorized metrics spec."""
+    print(f"{'rows':>7} {'per-column ms':>14} {'spec ms':>8} {'speedup':>8}")
+    for n_rows in (1_000, 10_000, 50_000):
+        df = make_share_classes(n_rows)
+        pd.testing.assert_frame_equal(
+            derive_metrics_per_column(df), derive_metrics(df), check_like=True
+        )
+
+        per_column_ms = best_of(lambda: derive_metrics_per_column(df), repeat=3)
+        spec_ms = best_of(lambda: derive_metrics(df), repeat=3)
+        speedup = per_column_ms / spec_ms
+        print(f"{n_rows:>7} {per_column_ms:>14.1f} {spec_ms:>8.1f} {speedup:>7.1f}x")
+
+
+def make_narratives(n_rows: int) -> tuple:
+    """Build a narrative template and sheet rows shaped like the real ones.
+
+    Every column has a slot among static sections; legal_id holds lei_code,
+    and its cell values bring lei_code back, as the workbook's do.
+    """
+    columns = template_builder.COLUMN_NAMES
+    sections = []
+    for col in columns:
+        if col == "lei_code":
+            continue
+        content = '<span id="lei_code">LEI</span>' if col == "legal_id" else "text"
+        sections.append(
+            f'<div class="section">\n  <h2>Question</h2>\n  <img src="logo.png">\n'
+            f'  <div id="{col}">{content}</div>\n</div>\n'
+        )
+    template = f"<html><body>\n{''.join(sections)}</body></html>"
+
+    rng = random.Random(0)
+    rows = []
+    for i in range(n_rows):
+        row = {
+            col: f"<p>Answer {rng.randrange(5)} to {col} &amp; more<br>text</p>"
+            for col in columns
+        }
+        row["legal_id"] = 'Identifier: <span id="lei_code"></span>'
+        row["lei_code"] = f"LEI{i:05d}"
+        rows.append(pd.Series(row))
+    return template, rows
+
+
+def bench_templates() -> None:
+    """Parse the template and every cell per row vs fill the compiled template."""
+    columns = template_builder.COLUMN_NAMES
+    print(f"{'rows':>5} {'soup ms':>10} {'compiled ms':>12} {'speedup':>8}")
+    for n_rows in (8, 32, 64):
+        template, rows = make_narratives(n_rows)
+        for row in rows:
+            assert template_builder.render_compiled(
+                template, row, columns
+            ) == template_builder.render_with_soup(template, row, columns)
+
+        def compiled():
+            # Compile from scratch, as a new process does
+            template_builder.compile_html.cache_clear()
+            for row in rows:
+                template_builder.render_compiled(template, row, columns)
+
+        soup_ms = best_of(
+            lambda: [
+                template_builder.render_with_soup(template, row, columns)
+                for row in rows
+            ],
+            repeat=3,
+        )
+        compiled_ms = best_of(compiled, repeat=3)
+        speedup = soup_ms / compiled_ms
+        print(f"{n_rows:>5} {soup_ms:>10.1f} {compiled_ms:>12.1f} {speedup:>7.1f}x")
+
+
+def make_plot_rows(n_rows: int, n_distinct: int) -> List[pd.Series]:
+    """Build report rows with n_distinct sets of plot inputs, e.g. zero alignment."""
+    rng = np.random.default_rng(0)
+    inputs = [
+        dict(zip(plot_builder.PLOT_COLUMNS, rng.random(len(plot_builder.PLOT_COLUMNS))))
+        for _ in range(n_distinct)
+    ]
+    return [pd.Series(inputs[i % n_distinct]) for i in range(n_rows)]
+
+
+def bench_plots() -> None:
+    """Render every plot vs the content-addressed plot cache, cold and warm."""
+    print(
+        f"{'rows':>5} {'distinct':>9} {'render ms':>10} {'cold ms':>8} "
+        f"{'warm ms':>8}"
+    )
+    for n_rows, n_distinct in ((8, 2), (8, 8)):
+        rows = make_plot_rows(n_rows, n_distinct)
+        with tempfile.TemporaryDirectory() as folder:
+            cache_dir = os.path.join(folder, "cache")
+
+            def build(cache_dir, output_dir):
+                os.makedirs(output_dir, exist_ok=True)
+                return [
+                    plot_builder.build_plot(row, output_dir, "en", cache_dir)
+                    for row in rows
+                ]
+
+            start = time.perf_counter()
+            uncached = build(None, os.path.join(folder, "uncached"))
+            render_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            cold = build(cache_dir, os.path.join(folder, "cold"))
+            cold_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            warm = build(cache_dir, os.path.join(folder, "warm"))
+            warm_ms = (time.perf_counter() - start) * 1000
+            assert uncached == cold == warm
+            assert len(os.listdir(cache_dir)) == n_distinct
+
+        print(
+            f"{n_rows:>5} {n_distinct:>9} {render_ms:>10.1f} {cold_ms:>8.1f} "
+            f"{warm_ms:>8.1f}"
+        )
+
+
+# Modules imported by the pipeline driver, the watcher and pool workers
+IMPORTED_MODULES = [
+    "aladdin_average_generator",
+    "bbdd_snapshot",
+    "fingerprints",
+    "html_table_generator",
+    "plot_builder",
+    "00_data_preper",
+    "01_template_builder",
+    "02_report_builder",
+    "pipeline",
+    "processed_data_store",
+    "derived_metrics",
+]
+
+
+def cold_import(module: str, folder: str, mpl_folder: str) -> float:
+    """Import module in a fresh interpreter run from folder, in ms.
+
+    HOME points to folder too and stdin is closed, so an import that prompts
+    for input or reads the project files fails. matplotlib keeps its font
+    cache in mpl_folder.
+    """
+    code = (
+        "import importlib, time; start = time.perf_counter(); "
+        f"importlib.import_module({module!r}); print(time.perf_counter() - start)"
+    )
+    env = dict(
+        os.environ,
+        HOME=folder,
+        PYTHONPATH=os.path.dirname(os.path.abspath(__file__)),
+        MPLBACKEND="Agg",
+        MPLCONFIGDIR=mpl_folder,
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=folder,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    return float(result.stdout.splitlines()[-1]) * 1000
+
+
+def bench_cold_import() -> None:
+    """Cold import time of the stage modules, which must not touch any file."""
+    print(f"{'module':<26} {'import ms':>10}")
+    with tempfile.TemporaryDirectory() as folder, tempfile.TemporaryDirectory() as mpl:
+        for module in IMPORTED_MODULES:
+            import_ms = min(cold_import(module, folder, mpl) for _ in range(3))
+            created = os.listdir(folder)
+            assert not created, f"importing {module} created {created}"
+            print(f"{module:<26} {import_ms:>10.1f}")
+
+
+BENCHMARKS = {
+    "post_contractual": bench_post_contractual,
+    "top_investments": bench_top_investments,
+    "sectors": bench_sectors,
+    "top_n": bench_top_n,
+    "html_tables": bench_html_tables,
+    "translation": bench_translation,
+    "bbdd": bench_bbdd,
+    "processed_data": bench_processed_data,
+    "derived_metrics": bench_derived_metrics,
+    "templates": bench_templates,
+    "plots": bench_plots,
+    "cold_import": bench_cold_import,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "benchmarks",
+        nargs="*",
+        help=f"benchmarks to run, among {', '.join(BENCHMARKS)} (default: all)",
+    )
+    args = parser.parse_args()
+
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    for name in args.benchmarks or BENCHMARKS:
+        print(f"\n== {name}: {BENCHMARKS[name].__doc__}")
+        BENCHMARKS[name]()
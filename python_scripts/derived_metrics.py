@@ -0,0 +1,115 @@
+"""Declarative spec of the report metrics derived in data prep.
+
+Each derived column is one operation over columns of the frame, evaluated in
+order on whole columns at once, so a frame of tens of thousands of share
+classes costs a handful of NumPy operations. Data prep, the post_data
+notebook and what-if reruns all call derive_metrics, with other specs if
+needed.
+"""
+
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class DerivedMetric(NamedTuple):
+    """A column computed by an operation over other columns."""
+
+    column: str  # column written, possibly one of the operands
+    operation: str  # key of OPERATIONS
+    operands: Tuple[str, ...]  # columns passed to the operation, in order
+
+
+# Operations of the spec, on float64 arrays
+OPERATIONS: Dict[str, Callable[..., np.ndarray]] = {
+    "percent": lambda fraction: fraction * 100,  # fraction shown as 0-100
+    "complement": lambda percent: 100 - percent,  # rest of 100%
+    "difference": lambda left, right: left - right,
+}
+
+# Aladdin gives these as fractions; the report shows percentages
+PERCENT_COLUMNS = [
+    "{{es_aligned}}",
+    "{{sust_invest}}",
+    "{{sust_invest_env}}",
+    "{{sust_invest_soc}}",
+]
+
+# Taxonomy KPIs whose non-aligned rest is shown in the charts
+ALIGNED_COLUMNS = [
+    f"total_{kpi}_aligned{suffix}"
+    for kpi in ("capex", "opex", "turnover")
+    for suffix in ("", "_exsovereign")
+]
+
+# Evaluated in order: a metric sees the columns computed before it
+DERIVED_METRICS: List[DerivedMetric] = (
+    [DerivedMetric(col, "percent", (col,)) for col in PERCENT_COLUMNS]
+    + [
+        DerivedMetric("{{other_nones}}", "complement", ("{{es_aligned}}",)),
+        DerivedMetric(
+            "{{other_non_sust}}", "difference", ("{{es_aligned}}", "{{sust_invest}}")
+        ),
+    ]
+    + [
+        DerivedMetric(col.replace("total_", "rest_", 1), "complement", (col,))
+        for col in ALIGNED_COLUMNS
+    ]
+)
+
+# ESG grade of the average score: the first band whose floor the score
+# exceeds, else the default grade (scores of 55 or less, and missing scores)
+ESG_SCORE_COLUMN = "{{esg_score_2024}}"
+ESG_GRADE_BANDS: List[Tuple[float, str]] = [(80, "A+"), (65, "A"), (55, "A-")]
+ESG_DEFAULT_GRADE = "B"
+
+# Decimals kept on every numeric column of the final data
+ROUND_DECIMALS = 2
+
+
+def esg_grades(
+    scores: pd.Series,
+    bands: List[Tuple[float, str]] = ESG_GRADE_BANDS,
+    default: str = ESG_DEFAULT_GRADE,
+) -> pd.Series:
+    """Return the ESG grade of each score, as strings."""
+    values = scores.to_numpy(dtype="float64")
+    grades = np.select(
+        [values > floor for floor, _ in bands],
+        [grade for _, grade in bands],
+        default=default,
+    )
+    return pd.Series(grades, index=scores.index, dtype=object)
+
+
+def derive_metrics(
+    df: pd.DataFrame,
+    metrics: List[DerivedMetric] = DERIVED_METRICS,
+    grade_bands: List[Tuple[float, str]] = ESG_GRADE_BANDS,
+    decimals: int = ROUND_DECIMALS,
+) -> pd.DataFrame:
+    """Return df with the derived metrics, the ESG grade and rounded numbers.
+
+    df itself is left untouched. Raises ValueError for an unknown operation
+    and KeyError for a missing column.
+    """
+    unknown = {metric.operation for metric in metrics} - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown metric operations: {sorted(unknown)}")
+
+    # Evaluate the whole spec on arrays, then write every column at once
+    values: Dict[str, np.ndarray] = {}
+    for metric in metrics:
+        operands = [
+            values[col] if col in values else df[col].to_numpy(dtype="float64")
+            for col in metric.operands
+        ]
+        values[metric.column] = OPERATIONS[metric.operation](*operands)
+
+    df = df.assign(**values)
+    df[ESG_SCORE_COLUMN] = esg_grades(df[ESG_SCORE_COLUMN], grade_bands)
+
+    numeric_columns = df.select_dtypes(include=["float64", "int64"]).columns
+    df[numeric_columns] = df[numeric_columns].round(decimals)
+    return df
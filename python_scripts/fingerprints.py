@@ -0,0 +1,29 @@
+"""Content fingerprints of the input files, shared by the stages.
+
+The averaging manifest and the BBDD snapshot cache are both keyed by the
+SHA-256 of the files they read.
+"""
+
+import hashlib
+import os
+from typing import Dict, Tuple
+
+# SHA-256 of the files hashed by this process, by path, size and mtime
+_FINGERPRINTS: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_fingerprint(file: str) -> str:
+    """Return the SHA-256 of a file's content.
+
+    Hashes are remembered by size and modification time, so a long-running
+    process such as aladdin_watcher only reads the files that changed.
+    """
+    stat = os.stat(file)
+    key = (os.path.abspath(file), stat.st_size, stat.st_mtime_ns)
+    if key not in _FINGERPRINTS:
+        sha256 = hashlib.sha256()
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        _FINGERPRINTS[key] = sha256.hexdigest()
+    return _FINGERPRINTS[key]
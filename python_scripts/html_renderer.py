@@ -0,0 +1,78 @@
+"""Direct rendering of the report tables from the columns of a DataFrame.
+
+The report tables used to be written with DataFrame.to_html and parsed back
+with BeautifulSoup only to cut out the <tbody>, then wrapped in a hand-made
+<table> with its colgroup and thead. render_table writes the whole table in
+one pass over the columns. Text is escaped with html.escape; only the
+columns listed in markup_columns are written as HTML, as they are given.
+"""
+
+import html
+
+import numpy as np
+
+# Layout of the tables handed to the report templates. BeautifulSoup keeps
+# this whitespace when the tables are inserted, so it is part of the reports.
+TABLE_START = "\n        <table>\n            \n            <colgroup>"
+COL = '\n                <col class="col{}">'
+HEAD_START = (
+    "\n            </colgroup>\n        \n"
+    "            <thead>\n                <tr>\n                    "
+)
+HEAD_END = "\n                </tr>\n            </thead>\n            "
+TABLE_END = "\n        </table>\n    "
+
+
+def cell_text(value):
+    """Return the text of a cell as to_html writes it
+
+    Strings have their tabs and newlines escaped, then are stripped; missing
+    values read NaN (None for None) and other values are written with str.
+    """
+    if isinstance(value, str):
+        text = value.replace("\t", "\\t").replace("\r", "\\r")
+        return text.replace("\n", "\\n").strip()
+    if isinstance(value, float) and np.isnan(value):
+        return "NaN"
+    return str(value)
+
+
+def render_tbody(df, markup_columns=()):
+    """Write the <tbody> of df, one <tr> per row
+
+    Cells are escaped, except in the columns named in markup_columns.
+    """
+    columns = []
+    for col, values in df.items():
+        texts = [cell_text(value) for value in values.tolist()]
+        if col not in markup_columns:
+            texts = [html.escape(text, quote=False) for text in texts]
+        columns.append(texts)
+
+    rows = [
+        "<tr>\n" + "".join(f"<td>{text}</td>\n" for text in cells) + "</tr>\n"
+        for cells in zip(*columns)
+    ]
+    return "<tbody>\n" + "".join(rows) + "</tbody>"
+
+
+def render_table(df, markup_columns=()):
+    """Write the <table> of df: a colgroup with one col per column, the thead
+    and the tbody
+
+    The column names are always escaped; the cells are escaped except in the
+    columns named in markup_columns.
+    """
+    cols = "".join(COL.format(i) for i in range(1, len(df.columns) + 1))
+    headers = "".join(
+        f"<th>{html.escape(str(col), quote=False)}</th>" for col in df.columns
+    )
+    return (
+        TABLE_START
+        + cols
+        + HEAD_START
+        + headers
+        + HEAD_END
+        + render_tbody(df, markup_columns)
+        + TABLE_END
+    )
@@ -1,43 +1,19 @@
-import json
 import logging
 import os
 import sys
-from pathlib import Path
 
 import numpy as np
 import pandas as pd
-from bs4 import BeautifulSoup
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
-
-
-def load_translations():
-    """Load translations from JSON file"""
-    script_dir = Path(__file__).resolve().parent
-    translations_path = script_dir / "translations.json"
-
-    print(f"Attempting to load translations from: {translations_path}")  # Debug print
-
-    if not translations_path.exists():
-        raise FileNotFoundError(f"Translations file not found at {translations_path}")
-
-    with open(translations_path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-TRANSLATIONS = load_translations()
+from html_renderer import render_table
+from translation_catalog import get_catalog
 
 
 def translate_text(text, target_language):
     """
-    Translate text using the predefined dictionary
+    Translate text using the catalog of the target language
     """
-    if target_language == "en":
-        return text
-    return TRANSLATIONS.get(target_language, {}).get(text, text)
+    return get_catalog(target_language).translate(text)
 
 
 def generate_html_table(df, table_structure="investment", target_language=None):
@@ -48,7 +24,7 @@ def generate_html_table(df, table_structure="investment", target_language=None):
     df : pandas DataFrame
         The data to convert to HTML
     table_structure : str
-        Either 'investment' or 'sector' to determine the table structure
+        Either 'investment' or 'sector'; both get one col per column
     target_language : str
         The target language code for translation
     """
@@ -71,66 +47,30 @@ def generate_html_table(df, table_structure="investment", target_language=None):
         # Then, when formatting for display
         df[col] = df[col].apply(lambda x: f"{x:.2%}" if pd.notnull(x) else "")
 
+    catalog = get_catalog(target_language)
+
     # Translate column names
-    df.columns = [translate_text(col, target_language) for col in df.columns]
+    df.columns = [catalog.translate(col) for col in df.columns]
 
     # Translate content (except for all-uppercase columns)
     for col in df.columns:
         if col.upper() != col:  # Skip columns with all uppercase names
-            df.loc[:, col] = df[col].apply(
-                lambda x: (
-                    translate_text(str(x), target_language) if pd.notnull(x) else x
-                )
-            )
+            df.loc[:, col] = catalog.translate_series(df[col])
 
     # drop column "ISIN" if it exists
     if "ISIN" in df.columns:
         df.drop(columns=["ISIN"], inplace=True)
 
-    # Generate the initial HTML table
-    html_str = df.to_html(classes="dataframe", index=False, escape=False)
-
-    # Parse the HTML using BeautifulSoup
-    soup = BeautifulSoup(html_str, "html.parser")
-
-    # Define column structure based on table type
-    if table_structure == "investment":
-        colgroup = """
-            <colgroup>
-                <col class="col1">
-                <col class="col2">
-                <col class="col3">
-                <col class="col4">
-            </colgroup>
-        """
-    else:  # sector structure
-        colgroup = """
-            <colgroup>
-                <col class="col1">
-                <col class="col2">
-            </colgroup>
-        """
-
-    # Create the table structure without the wrapper div
-    new_table = f"""
-        <table>
-            {colgroup}
-            <thead>
-                <tr>
-                    {"".join(f"<th>{col}</th>" for col in df.columns)}
-                </tr>
-            </thead>
-            {str(soup.find("tbody"))}
-        </table>
-    """
-
-    return new_table
+    # Write the table, one col per column, without the wrapper div
+    return render_table(df)
 
 
 def main(language=None):
     if language is None:
-        if len(sys.argv) > 1:
-            language = sys.argv[1]
+        # Take the first argument that is not an option such as --resume
+        args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+        if args:
+            language = args[0]
         else:
             try:
                 language = input("Enter the language code (es, en, pt, or pl): ")
@@ -147,4 +87,9 @@ def main(language=None):
 
 
 if __name__ == "__main__":
+    # Set up logging
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
     input_language = main()
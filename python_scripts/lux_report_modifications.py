@@ -1,34 +1,26 @@
-import os
-import glob
-from add_column_table import process_html_file  # Import the transformation function
+import importlib
+import logging
 
-# Define the directory containing your final report HTML files
-final_reports_dir = r"C:\Users\n740789\Documents\sfdr_report_generator\final_reports"
+from add_column_table import load_sector_mapping
 
-# Define the file pattern (raw string to avoid escaping backslashes)
-file_pattern = r"20250227_*en.html"
-
-# Build the full search pattern (e.g. "C:\...\final_reports\20250227_*en.html")
-search_pattern = os.path.join(final_reports_dir, file_pattern)
+# The report builder's name starts with a digit, so import it by name
+report_builder = importlib.import_module("02_report_builder")
 
 # Define the mapping Excel file path (as used in add_column_table.py)
 mapping_excel_path = r"C:\Users\n740789\Downloads\Sector-Subsector_Distribution.xlsx"
 
-# Get a list of all matching files
-html_files = glob.glob(search_pattern)
-
-if not html_files:
-    print("No HTML files matching the pattern were found.")
-else:
-    for file_path in html_files:
-        print(f"Processing file: {file_path}")
-        # Process the file using the function from add_column_table.py
-        modified_html = process_html_file(file_path, mapping_excel_path)
-
-        # Write the modified HTML back to the file (or to a new file if preferred)
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(modified_html)
-
-        print(f"Saved modified file: {file_path}")
-
-print("All files have been processed.")
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
+    # Build the English reports of the day with a Sectors column added to the
+    # sector data of each fund, instead of editing the finished reports.
+    # add_column_table.process_html_file still edits reports built without it.
+    report_builder.build_reports(
+        report_builder.load_processed_data(),
+        "en",
+        load_sector_mapping(mapping_excel_path),
+    )
+
+    print("All files have been processed.")
@@ -10,6 +10,9 @@ import numpy as np
 import pandas as pd
 from bs4 import BeautifulSoup
 
+from bbdd_snapshot import load_bbdd
+from html_renderer import render_table
+
 # set logging
 logging.basicConfig(
     level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -23,22 +26,12 @@ DATE = datetime.now().strftime("%Y%m%d")
 def get_mapping():
     logging.info("Getting mapping dict...")
     try:
-        mapping_df = pd.read_excel(
-            r"C:\Users\n740789\Documents\sfdr_report_generator\excel_books\bbdd_sfdr_wip.xlsx",
-            usecols=["aladdin_code", "{{product_name}}"],
-            engine="openpyxl",
-        )
-
-        mapping_df.aladdin_code = mapping_df.aladdin_code.str.strip().str.upper()
-        mapping_df["{{product_name}}"] = (
-            mapping_df["{{product_name}}"].str.strip().str.replace(" ", "_")
+        bbdd = load_bbdd(
+            r"C:\Users\n740789\Documents\sfdr_report_generator\excel_books\bbdd_sfdr_wip.xlsx"
         )
 
-        # Convert the DataFrame to a reversed dictionary
-        mapping_dict = mapping_df.set_index("{{product_name}}").to_dict()[
-            "aladdin_code"
-        ]
-        return mapping_dict
+        # Underscored product names, as in the report file names, to codes
+        return bbdd.product_codes()
     except Exception as e:
         logging.error(f"Failed to get mapping dict: {e}")
         exit(1)
@@ -95,34 +88,8 @@ def generate_html_table(excel_path: str):
             logging.warning(f"Excel file is empty: {excel_path}")
             return ""
 
-        # Generate the initial HTML table
-        html_str = df_filtered.to_html(classes="dataframe", index=False, escape=False)
-
-        # Parse the HTML using BeautifulSoup
-        soup = BeautifulSoup(html_str, "html.parser")
-
-        # Define column structure based on table type
-        colgroup = """
-                    <colgroup>
-                      <col class="col1" />
-                      <col class="col2" /> 
-                      <col class="col3" /> 
-                    </colgroup>
-            """
-        # Create the table structure without the wrapper div
-        new_table = f"""
-            <table>
-                {colgroup}
-                <thead>
-                    <tr>
-                        {"".join(f"<th>{col}</th>" for col in df_filtered.columns)}
-                    </tr>
-                </thead>
-                {str(soup.find("tbody"))}
-            </table>
-        """
-
-        return new_table
+        # Write the table, one col per column, without the wrapper div
+        return render_table(df_filtered)
     except Exception as e:
         logging.error(f"Error generating HTML table: {e}")
         return ""
@@ -0,0 +1,86 @@
+import argparse
+import importlib
+import logging
+from typing import List
+
+from html_table_generator import main as get_language
+from processed_data_store import load_processed_store
+
+# The stage scripts' names start with a digit, so import them by name
+data_preper = importlib.import_module("00_data_preper")
+template_builder = importlib.import_module("01_template_builder")
+report_builder = importlib.import_module("02_report_builder")
+
+# Run from the project folder, like the stage scripts:
+#
+#     python python_scripts/pipeline.py es en pt pl --workers=4
+#
+# Data prep, from the Aladdin averaging to the fund tables, is done once, and
+# so is the template build from the narratives workbook; only the reports are
+# built per language.
+
+
+def run_pipeline(
+    languages: List[str], workers: int = 1, resume: bool = False, excel: bool = False
+) -> bool:
+    """Prepare the data and the templates once, then build the reports per language.
+
+    The averages and the final processed data are saved as for 00_data_preper,
+    plus .xlsx copies with excel. Returns False if data prep failed.
+    """
+    final_df = data_preper.prepare_processed_data(workers, resume, excel)
+    if final_df is None:
+        logging.error("Failed to process the Aladdin data, no report was built")
+        return False
+
+    # The reports read the data as saved, with the tables in their side files
+    output_file = data_preper.save_processed_data(final_df, excel=excel)
+    report_df = load_processed_store(output_file)
+
+    logging.info(f"Building the templates of {', '.join(languages)}")
+    template_builder.build_all_templates(languages, workers=workers)
+
+    for language in languages:
+        logging.info(f"Building the '{language}' reports")
+        report_builder.build_reports(
+            report_df, language, workers=workers, data_dir=output_file.parent
+        )
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the SFDR reports of several languages in one pass"
+    )
+    parser.add_argument(
+        "languages", nargs="+", help="report languages among es, en, pt and pl"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes used to average and prepare the funds and to "
+        "render the templates and reports (default: 1)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip the averaging and read its outputs already on disk",
+    )
+    parser.add_argument(
+        "--excel",
+        action="store_true",
+        help="also save the averages and the final processed data as Excel copies",
+    )
+    args = parser.parse_args()
+
+    # Set up logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[logging.FileHandler("logs/pipeline.log"), logging.StreamHandler()],
+    )
+
+    # Validate every language before any work is done
+    languages = [get_language(language) for language in dict.fromkeys(args.languages)]
+    run_pipeline(languages, args.workers, args.resume, args.excel)
@@ -1,6 +1,9 @@
+import hashlib
 import json
 import logging
 import os
+import shutil
+import time
 from textwrap import wrap
 
 import matplotlib.pyplot as plt
@@ -8,27 +11,165 @@ from matplotlib.lines import Line2D
 import numpy as np
 import pandas as pd
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+from translation_catalog import get_catalog
+
+# Rendering settings, part of the cache key of every plot; bump the style
+# version whenever build_plot draws the plots differently
+PLOT_DPI = 300
+PLOT_FIGSIZE = (22, 8)
+PLOT_STYLE_VERSION = 1
+
+# Row values drawn in the plots
+PLOT_COLUMNS = [
+    f"{prefix}_{kpi}_{part}{suffix}"
+    for suffix in ("", "_exsovereign")
+    for kpi in ("turnover", "capex", "opex")
+    for prefix, part in (
+        ("total", "gas"),
+        ("total", "nuclear"),
+        ("total", "nogasnonuclear"),
+        ("rest", "aligned"),
+    )
+] + ["portfolio_mv_exsov"]
+
+# Texts of the plots, translated to the report language
+PLOT_TEXTS = [
+    "Turnover",
+    "This graph represents x_subs% of the total investments.",
+    "Taxonomy-aligned: Fossil gas",
+    "Taxonomy-aligned: Nuclear",
+    "Taxonomy-aligned (no gas and nuclear)",
+    "Non Taxonomy-aligned",
+    "Percentage",
+    "1. Taxonomy-alignment of investments including sovereign bonds*",
+    "2. Taxonomy-alignment of investments excluding sovereign bonds*",
+]
+
+# Persistent cache of the rendered plots, by plot_key, shared by every run
+PLOT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "plot_cache"
 )
+PLOT_CACHE_MAX_BYTES = 1024**3
+
+# Temporary files older than this were left by a render or copy that died
+STALE_TEMP_SECONDS = 3600
+
+
+def plot_key(row_data, input_language, dpi=PLOT_DPI):
+    """Return the SHA-256 of everything a plot is rendered from"""
+    translate = get_catalog(input_language).translate
+    inputs = {
+        "values": [float(row_data[col]) for col in PLOT_COLUMNS],
+        "language": input_language,
+        "texts": [translate(text) for text in PLOT_TEXTS],
+        "style": PLOT_STYLE_VERSION,
+        "figsize": PLOT_FIGSIZE,
+        "dpi": dpi,
+    }
+    return hashlib.sha256(
+        json.dumps(inputs, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def remove_quietly(path):
+    """Delete path if it exists, e.g. a temporary file already renamed or not"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def copy_atomic(source, destination):
+    """Copy a file so that readers and other processes never see it half written"""
+    temp_path = f"{destination}.{os.getpid()}.tmp"
+    try:
+        shutil.copyfile(source, temp_path)
+        os.replace(temp_path, destination)
+    finally:
+        remove_quietly(temp_path)
+
+
+def build_plot(row_data, output_dir, input_language, cache_dir=PLOT_CACHE_DIR):
+    """Write the taxonomy plot of a report row to output_dir
 
+    The plot is named after its plot_key, so reports with the same inputs
+    share it and parallel runs never overwrite each other's. It is rendered
+    once into cache_dir and copied from there by later runs; cache_dir None
+    renders it every time. Returns the plot's filename.
+    """
+    key = plot_key(row_data, input_language)
+    plot_filename = f"plot_{key[:16]}.png"
+    plot_path = os.path.join(output_dir, plot_filename)
+    if cache_dir is None:
+        render_plot(row_data, plot_path, input_language)
+        return plot_filename
+
+    cached_path = os.path.join(cache_dir, f"{key}.png")
+    if os.path.exists(cached_path):
+        # Mark it as recently used for evict_plot_cache
+        os.utime(cached_path)
+        logging.info(f"Plot reused from cache: {cached_path}")
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{cached_path}.{os.getpid()}.tmp"
+        try:
+            render_plot(row_data, temp_path, input_language)
+            os.replace(temp_path, cached_path)
+        finally:
+            remove_quietly(temp_path)
+
+    if not os.path.exists(plot_path):
+        copy_atomic(cached_path, plot_path)
+    return plot_filename
+
+
+def evict_plot_cache(cache_dir=PLOT_CACHE_DIR, max_bytes=PLOT_CACHE_MAX_BYTES):
+    """Delete the least recently used plots of the cache beyond max_bytes
+
+    Temporary files older than STALE_TEMP_SECONDS, left by a render that was
+    killed, are deleted too. Failures are only logged, since the cache is a
+    pure optimization.
+    """
+    try:
+        files = [entry for entry in os.scandir(cache_dir) if entry.is_file()]
+    except FileNotFoundError:
+        return
 
-def build_plot(row_data, output_dir, report_id, translations, input_language):
-    # Function to translate text based on the input language
-    def translate(text, lang, trans=translations):
-        if lang == "en":
-            return text
-        translated = trans.get(lang, {}).get(text, text)
-        if translated == text:
-            logging.warning(f"No translation found for '{text}' in language '{lang}'")
-        return translated
+    stale_before = time.time() - STALE_TEMP_SECONDS
+    for entry in files:
+        if entry.name.endswith(".tmp") and entry.stat().st_mtime < stale_before:
+            try:
+                os.remove(entry.path)
+                logging.info(f"Deleted stale temporary plot {entry.path}")
+            except OSError as e:
+                logging.warning(f"Could not delete stale plot {entry.path}: {e}")
+
+    entries = [entry for entry in files if entry.name.endswith(".png")]
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+
+    total, evicted = 0, 0
+    for entry in entries:
+        total += entry.stat().st_size
+        if total > max_bytes:
+            try:
+                os.remove(entry.path)
+                evicted += 1
+            except OSError as e:
+                logging.warning(f"Could not evict cached plot {entry.path}: {e}")
+    if evicted:
+        logging.info(f"Evicted {evicted} plots from the cache {cache_dir}")
+
+
+def render_plot(row_data, plot_path, input_language, dpi=PLOT_DPI):
+    """Render the taxonomy plot of a report row to plot_path, as a PNG"""
+    # Texts without translation are reported once per run by the caller
+    translate = get_catalog(input_language).translate
 
     # Function to prepare data for plotting
     def prepare_data(row, include_sov):
         suffix = "" if include_sov else "_exsovereign"
         data = {
-            translate("Turnover", input_language): {
+            translate("Turnover"): {
                 "gas": row[f"total_turnover_gas{suffix}"],
                 "nuclear": row[f"total_turnover_nuclear{suffix}"],
                 "nogasnonuclear": row[f"total_turnover_nogasnonuclear{suffix}"],
@@ -59,7 +200,7 @@ def build_plot(row_data, output_dir, report_id, translations, input_language):
 
     # Translate the total investments string
     STRING_TOT_INVESTMENTS = translate(
-        "This graph represents x_subs% of the total investments.", input_language
+        "This graph represents x_subs% of the total investments."
     )
     UPDATED_STRING = STRING_TOT_INVESTMENTS.replace(
         "x_subs", f"{data_without_sb['total_investments'].iloc[0] * 100:.1f}"
@@ -70,7 +211,7 @@ def build_plot(row_data, output_dir, report_id, translations, input_language):
         categories = [
             "OpEx",
             "CapEx",
-            translate("Turnover", input_language),
+            translate("Turnover"),
         ]
         columns = ["gas", "nuclear", "nogasnonuclear", "rest"]
         colors = [
@@ -80,10 +221,10 @@ def build_plot(row_data, output_dir, report_id, translations, input_language):
             "#dadada",  # grey
         ]
         labels = [
-            translate("Taxonomy-aligned: Fossil gas", input_language),
-            translate("Taxonomy-aligned: Nuclear", input_language),
-            translate("Taxonomy-aligned (no gas and nuclear)", input_language),
-            translate("Non Taxonomy-aligned", input_language),
+            translate("Taxonomy-aligned: Fossil gas"),
+            translate("Taxonomy-aligned: Nuclear"),
+            translate("Taxonomy-aligned (no gas and nuclear)"),
+            translate("Non Taxonomy-aligned"),
         ]
 
         bar_height = 0.3  # Set bar height; stick to 0.3; 0.5 is too wide
@@ -149,7 +290,7 @@ def build_plot(row_data, output_dir, report_id, translations, input_language):
         # Set chart properties
         ax.set_xlim(0, 100)
         ax.set_xticks(range(0, 101, 25))
-        ax.set_xlabel(translate("Percentage", input_language), fontsize=14)
+        ax.set_xlabel(translate("Percentage"), fontsize=14)
         wrapped_title = "\n".join(wrap(title, width=40))
         ax.set_title(wrapped_title, fontsize=24, wrap=True)
 
@@ -165,7 +306,7 @@ def build_plot(row_data, output_dir, report_id, translations, input_language):
         return ax.get_legend_handles_labels()
 
     # Create the figure with two subplots / edit plot size here
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(22, 8))
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=PLOT_FIGSIZE)
 
     # Add a vertical line between the subplots
     fig.subplots_adjust(wspace=0.5)  # Adjust space between subplots if necessary
@@ -185,16 +326,14 @@ def build_plot(row_data, output_dir, report_id, translations, input_language):
         ax1,
         data_with_sb,
         title=translate(
-            "1. Taxonomy-alignment of investments including sovereign bonds*",
-            input_language,
+            "1. Taxonomy-alignment of investments including sovereign bonds*"
         ),
     )
     handles2, labels2 = create_chart(
         ax2,
         data_without_sb,
         title=translate(
-            "2. Taxonomy-alignment of investments excluding sovereign bonds*",
-            input_language,
+            "2. Taxonomy-alignment of investments excluding sovereign bonds*"
         ),
     )
 
@@ -232,10 +371,8 @@ def build_plot(row_data, output_dir, report_id, translations, input_language):
     plt.subplots_adjust(bottom=0.3, wspace=0.5)  # Adjusted from 0.3 to 0.2
 
     # Save the plot
-    plot_filename = f"plot_{report_id}.png"
-    plot_path = os.path.join(output_dir, plot_filename)
     plt.savefig(
-        plot_path, bbox_inches="tight", dpi=300
+        plot_path, bbox_inches="tight", dpi=dpi, format="png"
     )  # Increased DPI for better quality
 
     # logg where the plot was saved
@@ -243,5 +380,3 @@ def build_plot(row_data, output_dir, report_id, translations, input_language):
 
     # Close the plot to free up memory
     plt.close()
-
-    return plot_filename
@@ -0,0 +1,126 @@
+"""Typed Parquet store of the final processed data, from data prep to reports.
+
+Every column gets an explicit Arrow type. The placeholders filled from the
+BBDD, the ESG grade and the name of the tables file are strings; the Aladdin
+metrics and the metrics derived from them are float64. Columns added to the
+BBDD later are typed from their data.
+
+The tables of each fund (top investments, sectors) are not part of the
+store: they are saved as records in a JSON side file per fund and rendered
+by the report builder.
+"""
+
+import json
+import logging
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Text placeholders, whatever type a cell of their source had
+TEXT_COLUMNS = [
+    "security_description",
+    "narrative",
+    "language",
+    "{{product_name}}",
+    "{{lei_code}}",
+    "{{ref_period}}",
+    "{{taxonomy_2022}}",
+    "{{taxonomy_2023}}",
+    "{{esg_score_2022}}",
+    "{{esg_score_2023}}",
+    "{{esg_score_2024}}",
+    "tables_file",
+]
+
+# Percentages of the Aladdin data rescaled by data prep and the ones derived
+METRIC_COLUMNS = [
+    "{{es_aligned}}",
+    "{{sust_invest}}",
+    "{{sust_invest_env}}",
+    "{{sust_invest_soc}}",
+    "{{other_nones}}",
+    "{{other_non_sust}}",
+] + [
+    f"{prefix}_{kpi}_aligned{suffix}"
+    for kpi in ("capex", "opex", "turnover")
+    for prefix in ("total", "rest")
+    for suffix in ("", "_exsovereign")
+]
+
+
+def processed_data_schema(df: pd.DataFrame) -> pa.Schema:
+    """Return the Arrow schema of a final processed data frame.
+
+    Raises ValueError if a placeholder or metric is missing, or if a metric
+    is not numeric.
+    """
+    missing = [col for col in TEXT_COLUMNS + METRIC_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Final processed data is missing the columns {missing}")
+
+    fields = []
+    for col in df.columns:
+        numeric = df[col].dtype.kind in "fiu"  # floats and integers
+        if col in METRIC_COLUMNS and not numeric:
+            raise ValueError(f"Final processed data column {col} is not numeric")
+        if col in TEXT_COLUMNS or not numeric:
+            fields.append(pa.field(col, pa.string()))
+        else:
+            fields.append(pa.field(col, pa.float64()))
+    return pa.schema(fields)
+
+
+def _as_text(values: pd.Series) -> pd.Series:
+    """Cast cells to strings, keeping missing values missing."""
+    return values.map(lambda x: x if pd.isna(x) else str(x))
+
+
+def save_processed_store(df: pd.DataFrame, path) -> None:
+    """Write the final processed data to path with its explicit schema."""
+    schema = processed_data_schema(df)
+    df = df.copy()
+    for field in schema:
+        if field.type == pa.string():
+            df[field.name] = _as_text(df[field.name])
+    pq.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False), path)
+
+
+def load_processed_store(path) -> pd.DataFrame:
+    """Read the final processed data written by save_processed_store."""
+    df = pd.read_parquet(path)
+    # Parquet brings missing strings back as None; the reports expect NaN
+    for col in df.select_dtypes(include="object").columns:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    logging.info(f"Final processed data read from: {path}")
+    return df
+
+
+def save_table_records(tables: Dict[str, pd.DataFrame], path) -> None:
+    """Save the tables of a fund, by column name, as JSON records.
+
+    Missing cells are saved as null and read back as NaN.
+    """
+    records = {
+        name: {
+            "columns": [str(col) for col in table.columns],
+            "data": table.astype(object).where(table.notna(), None).values.tolist(),
+        }
+        for name, table in tables.items()
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False)
+
+
+def load_table_records(path) -> Dict[str, pd.DataFrame]:
+    """Read the tables of a fund saved by save_table_records."""
+    with open(path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    tables = {}
+    for name, table in records.items():
+        # Keep every column as text cells, as data prep left them
+        df = pd.DataFrame(table["data"], columns=table["columns"], dtype=object)
+        tables[name] = df.where(df.notna(), np.nan)
+    return tables
@@ -0,0 +1,93 @@
+"""Per-language translation catalogs built once from translations.json.
+
+English is the source language of the catalog: its texts are returned as they
+are. Texts without a translation are kept untranslated and remembered, so a
+run can log them once with report_misses instead of once per report.
+"""
+
+import json
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Set
+
+import pandas as pd
+
+TRANSLATIONS_FILE = Path(__file__).resolve().parent / "translations.json"
+
+
+class TranslationCatalog:
+    """Translations of one language, with the texts that had none."""
+
+    def __init__(self, language: str, entries: Dict[str, str]):
+        self.language = language
+        self.entries = entries
+        self.misses: Set[str] = set()
+
+    def translate(self, text: str) -> str:
+        """Return the translation of text, or text itself if there is none."""
+        if self.language == "en":
+            return text
+        translated = self.entries.get(text)
+        if translated is None:
+            # Amounts and percentages are not meant to be translated
+            if any(char.isalpha() for char in text):
+                self.misses.add(text)
+            return text
+        return translated
+
+    def translate_series(self, values: pd.Series) -> pd.Series:
+        """Translate the non-null values of a Series as strings.
+
+        Each distinct value is looked up once and mapped back onto the column,
+        since sector and holding names repeat across the rows of a table.
+        """
+        uniques = values.unique()
+        lookup = {
+            value: self.translate(str(value)) for value in uniques if pd.notna(value)
+        }
+        if not lookup:
+            # Only missing values, which a per-cell apply turns into NaN
+            return values.astype(float) if len(values) else values.copy()
+
+        translated = values.map(lookup)
+        if len(lookup) < len(uniques):
+            # Keep the missing values as they were, None included
+            translated = translated.where(values.notna(), values)
+        return translated
+
+    def take_misses(self) -> Set[str]:
+        """Return and forget the texts that had no translation so far."""
+        misses, self.misses = self.misses, set()
+        return misses
+
+    def add_misses(self, misses: Iterable[str]) -> None:
+        """Remember texts missed elsewhere, e.g. in a worker process."""
+        self.misses.update(misses)
+
+    def report_misses(self) -> None:
+        """Log the distinct texts without translation in a single warning."""
+        misses = self.take_misses()
+        if misses:
+            logging.warning(
+                f"No translation found in language '{self.language}' for "
+                f"{len(misses)} text(s):\n"
+                + "\n".join(f"  {text!r}" for text in sorted(misses))
+            )
+
+
+@lru_cache(maxsize=None)
+def load_translations() -> Dict[str, Dict[str, str]]:
+    """Read translations.json once; its entries are keyed by language."""
+    if not TRANSLATIONS_FILE.exists():
+        raise FileNotFoundError(f"Translations file not found at {TRANSLATIONS_FILE}")
+
+    with open(TRANSLATIONS_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def get_catalog(language: str) -> TranslationCatalog:
+    """Return the catalog of language, shared by every caller of the process."""
+    entries = {} if language == "en" else load_translations().get(language, {})
+    return TranslationCatalog(language, entries)
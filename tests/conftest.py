@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# The pipeline modules are flat scripts, imported from their folder
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "python_scripts")
+)
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from aladdin_average_generator import INPUT_FOLDER
+
+
+def write_aladdin_file(path, value, holdings=(("ISIN1", 40.0), ("ISIN2", 60.0))):
+    """Write a monthly Aladdin workbook with the sheets read by the averaging"""
+    post_contractual = pd.DataFrame(
+        [
+            ["Report", None, None],
+            [None, None, None],
+            [None, None, None],
+            ["Security Description", "sust_invest", "es_aligned"],
+            ["Fund", value, value * 2],
+        ]
+    )
+    sectorial = pd.DataFrame(
+        [[None, None, None]] * 5
+        + [[None, "Energy", f"{value}%"], [None, "Utilities", f"{100 - value}%"]]
+    )
+    top_investments = pd.DataFrame(
+        [[None] * 5] * 3
+        + [["ISIN", "Largest Investments", "Sector", "% Assets", "Country Name"]]
+        + [
+            [isin, f"Bond {isin}", "Energy", f"{weight}%", "Spain"]
+            for isin, weight in holdings
+        ]
+    )
+    with pd.ExcelWriter(path) as writer:
+        post_contractual.to_excel(
+            writer, sheet_name="Post-Contractual Info Data", index=False, header=False
+        )
+        sectorial.to_excel(
+            writer, sheet_name="Sectorial Distribution", index=False, header=False
+        )
+        top_investments.to_excel(
+            writer, sheet_name="Top Investments", index=False, header=False
+        )
+        pd.DataFrame({"Notes": ["kept"]}).to_excel(
+            writer, sheet_name="Notes", index=False
+        )
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """Project folder with the monthly files of two funds, used as the cwd"""
+    monkeypatch.chdir(tmp_path)
+    input_folder = tmp_path / INPUT_FOLDER
+    input_folder.mkdir(parents=True)
+    for i, prefix in enumerate(["FUND00001A", "FUND00001B"]):
+        for month in (1, 2):
+            write_aladdin_file(
+                input_folder / f"{prefix}_2024{month:02d}.xlsx", 10.0 * (i + month)
+            )
+    return tmp_path
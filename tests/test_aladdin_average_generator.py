@@ -0,0 +1,174 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import aladdin_average_generator as generator
+import anathrax_vol_max
+from conftest import write_aladdin_file
+
+
+def last_rebuilt(project, profile_name="aladdin"):
+    """Groups rebuilt by the last run, as recorded in the manifest"""
+    manifest_path = project / generator.OUTPUT_FOLDER / generator.MANIFEST_FILE
+    with open(manifest_path, encoding="utf-8") as f:
+        return json.load(f)["last_rebuilt"][profile_name]
+
+
+def test_manifest_rebuilds_only_the_groups_whose_inputs_changed(project):
+    first = generator.average_profiles(["aladdin"])
+    assert last_rebuilt(project) == ["FUND00001A", "FUND00001B"]
+
+    # Unchanged inputs are reloaded from their outputs
+    second = generator.average_profiles(["aladdin"])
+    assert last_rebuilt(project) == []
+    for prefix, (post, sectorial, top) in first["aladdin"].items():
+        reloaded = second["aladdin"][prefix]
+        pd.testing.assert_frame_equal(post, reloaded[0], check_dtype=False)
+        pd.testing.assert_frame_equal(sectorial, reloaded[1])
+        # The store numbers the holdings from 0
+        pd.testing.assert_frame_equal(top.reset_index(drop=True), reloaded[2])
+
+    # A new version of one monthly file only rebuilds its own group
+    changed = project / generator.INPUT_FOLDER / "FUND00001B_202402.xlsx"
+    write_aladdin_file(changed, 55.0)
+    third = generator.average_profiles(["aladdin"])
+    assert last_rebuilt(project) == ["FUND00001B"]
+    assert third["aladdin"]["FUND00001B"][0].loc[4, 1] == pytest.approx(37.5)
+
+
+def test_combined_run_matches_the_separate_scripts(project):
+    combined = generator.average_profiles(
+        ["aladdin", "anathrax"], output_formats=generator.EXCEL_OUTPUT_FORMATS
+    )
+
+    # The anathrax outputs stay out of the folder data prep reads back
+    output_folder = project / generator.OUTPUT_FOLDER
+    assert sorted(path.name for path in output_folder.glob("average_output_*")) == [
+        "average_output_FUND00001A",
+        "average_output_FUND00001A.xlsx",
+        "average_output_FUND00001B",
+        "average_output_FUND00001B.xlsx",
+    ]
+    anathrax_folder = output_folder / "anathrax"
+    assert sorted(path.name for path in anathrax_folder.iterdir()) == [
+        "average_output_FUND00001",
+        "average_output_FUND00001.xlsx",
+    ]
+
+    separate = {
+        "aladdin": generator.main(force=True),
+        "anathrax": anathrax_vol_max.main(force=True),
+    }
+    for name, results in separate.items():
+        assert list(combined[name]) == list(results)
+        for prefix, tables in results.items():
+            for table, combined_table in zip(tables, combined[name][prefix]):
+                pd.testing.assert_frame_equal(combined_table, table)
+                assert combined_table.attrs == table.attrs
+
+    # Every holding of the anathrax fund is kept, as fractions
+    top_investments = combined["anathrax"]["FUND00001"][2]
+    assert list(top_investments["% Assets"]) == [0.6, 0.4]
+
+
+def test_group_is_current_checks_inputs_settings_and_outputs(project):
+    generator.average_profiles(["aladdin"])
+    manifest = generator.load_manifest(generator.OUTPUT_FOLDER)
+    entry = manifest["groups"]["aladdin"]["FUND00001A"]
+    outputs = generator.group_outputs(
+        generator.OUTPUT_FOLDER, "FUND00001A", generator.OUTPUT_FORMATS
+    )
+    inputs = dict(entry["inputs"])
+
+    assert generator.group_is_current(
+        manifest, "aladdin", "FUND00001A", inputs, outputs
+    )
+
+    # Another fingerprint, a new file or a different profile make it stale
+    edited = {**inputs, "FUND00001A_202401.xlsx": "0" * 64}
+    added = {**inputs, "FUND00001A_202403.xlsx": "0" * 64}
+    for changed_inputs in (edited, added):
+        assert not generator.group_is_current(
+            manifest, "aladdin", "FUND00001A", changed_inputs, outputs
+        )
+    entry["settings"]["top_n"] = 5
+    assert not generator.group_is_current(
+        manifest, "aladdin", "FUND00001A", inputs, outputs
+    )
+
+    # So does an output deleted since the manifest was written
+    entry["settings"]["top_n"] = generator.TOP_INVESTMENTS_ROWS
+    os.remove(os.path.join(outputs["parquet"], generator.STORE_TABLES[0]))
+    assert not generator.group_is_current(
+        manifest, "aladdin", "FUND00001A", inputs, outputs
+    )
+
+
+def test_load_manifest_ignores_an_unreadable_or_outdated_file(project):
+    output_folder = project / generator.OUTPUT_FOLDER
+    output_folder.mkdir(parents=True)
+    manifest_path = output_folder / generator.MANIFEST_FILE
+    empty = {"version": generator.MANIFEST_VERSION, "groups": {}}
+
+    manifest_path.write_text("{not json", encoding="utf-8")
+    assert generator.load_manifest(str(output_folder)) == empty
+
+    manifest_path.write_text(
+        json.dumps({"version": generator.MANIFEST_VERSION - 1, "groups": {"x": {}}}),
+        encoding="utf-8",
+    )
+    assert generator.load_manifest(str(output_folder)) == empty
+
+
+def sector_workbook(*rows):
+    """Cached workbook of one file with a 'Sectorial Distribution' sheet"""
+    return {
+        "Sectorial Distribution": pd.DataFrame(
+            [[None, None, None]] * 5 + [[None, sector, pct] for sector, pct in rows]
+        )
+    }
+
+
+def test_batched_sectors_skip_a_bad_file_without_failing_the_batch(monkeypatch):
+    workbooks = {
+        "a1": sector_workbook(("Energy", "10%"), ("Utilities", "90%")),
+        "a2": sector_workbook(("Energy", "30%"), ("Utilities", "70%")),
+        "b1": sector_workbook(("Energy", "20%"), ("Utilities", "80%")),
+        "b2": sector_workbook(("Broken", "50%")),
+    }
+    file_groups = {"A": ["a1", "a2"], "B": ["b1", "b2"]}
+    clean_sector_sheet = generator.clean_sector_sheet
+
+    def failing_clean(df):
+        if df.isin(["Broken"]).any().any():
+            raise ValueError("unreadable sheet")
+        return clean_sector_sheet(df)
+
+    monkeypatch.setattr(generator, "clean_sector_sheet", failing_clean)
+    results = generator.process_sectorial_distributions(
+        file_groups, {prefix: workbooks for prefix in file_groups}
+    )
+
+    # Each group is averaged as on its own, the bad file being skipped
+    pd.testing.assert_frame_equal(
+        results["A"], generator.process_sectorial_distribution(["a1", "a2"], workbooks)
+    )
+    pd.testing.assert_frame_equal(
+        results["B"], generator.process_sectorial_distribution(["b1"], workbooks)
+    )
+
+
+@pytest.mark.parametrize("n_rows", [100, generator.PARTIAL_SELECTION_MIN_ROWS])
+def test_largest_rows_matches_a_full_sort(n_rows):
+    values = np.random.default_rng(0).random(n_rows)
+    values[: n_rows - 5] = np.nan  # fewer values than top_n
+    df = pd.DataFrame({"% Assets": values})
+
+    for top_n in (3, 15):
+        pd.testing.assert_frame_equal(
+            generator.largest_rows(df, "% Assets", top_n),
+            df.sort_values("% Assets", ascending=False).head(top_n),
+        )
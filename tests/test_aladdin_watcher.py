@@ -0,0 +1,81 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import aladdin_watcher
+from aladdin_watcher import INPUT_FOLDER, data_preper
+from conftest import write_aladdin_file
+
+PREFIXES = ["FUND_A", "FUND_B"]
+
+
+def fake_average_profiles(
+    profile_names, output_formats=(), pool=None, skip_reload=frozenset()
+):
+    """Averaging with unchanged files: the groups held by the caller map to None"""
+    return {
+        "aladdin": {
+            prefix: None if prefix in skip_reload else (prefix,) for prefix in PREFIXES
+        }
+    }
+
+
+def test_refresh_recovers_a_fund_whose_row_failed(monkeypatch):
+    attempts = []
+    saved = []
+
+    def build_processed_frame(prefix):
+        attempts.append(prefix)
+        if prefix == "FUND_B" and attempts.count(prefix) == 1:
+            raise OSError("transient read error")
+        return pd.DataFrame({"security_description": [prefix]})
+
+    monkeypatch.setattr(aladdin_watcher, "average_profiles", fake_average_profiles)
+    monkeypatch.setattr(data_preper, "load_results_tables", lambda prefix: (prefix,))
+    monkeypatch.setattr(data_preper, "build_processed_frame", build_processed_frame)
+    monkeypatch.setattr(data_preper, "finalize_processed_data", lambda df: df)
+    monkeypatch.setattr(
+        data_preper,
+        "save_processed_data",
+        lambda df, date, excel=False: saved.append(list(df["security_description"])),
+    )
+
+    rows = {}
+    assert aladdin_watcher.refresh(rows, None)
+    assert saved[-1] == ["FUND_A"]
+
+    # Nothing changed on disk, yet the failed fund is read back and rebuilt
+    assert aladdin_watcher.refresh(rows, None)
+    assert saved[-1] == ["FUND_A", "FUND_B"]
+    assert attempts == ["FUND_A", "FUND_B", "FUND_B"]
+
+
+def test_refresh_rereads_the_groups_rebuilt_by_a_failed_run(project, monkeypatch):
+    saved = []
+    monkeypatch.setattr(data_preper, "finalize_processed_data", lambda df: df)
+    monkeypatch.setattr(
+        data_preper,
+        "save_processed_data",
+        lambda df, date, excel=False: saved.append(list(df["sust_invest"])),
+    )
+    input_folder = project / INPUT_FOLDER
+    fund_b_files = sorted(input_folder.glob("FUND00001B_*.xlsx"))
+    fund_b_content = [path.read_bytes() for path in fund_b_files]
+
+    rows = {}
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        assert aladdin_watcher.refresh(rows, pool)
+        assert saved[-1] == [15.0, 25.0]
+
+        # A new month for one fund while the files of the other are unreadable:
+        # the first group is rebuilt, the second fails the refresh
+        write_aladdin_file(input_folder / "FUND00001A_202402.xlsx", 40.0)
+        for path in fund_b_files:
+            path.write_bytes(b"not a workbook")
+        assert not aladdin_watcher.refresh(rows, pool)
+
+        # Once the files are fixed, the rebuilt group is read back, not skipped
+        for path, content in zip(fund_b_files, fund_b_content):
+            path.write_bytes(content)
+        assert aladdin_watcher.refresh(rows, pool)
+        assert saved[-1] == [25.0, 25.0]
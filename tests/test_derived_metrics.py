@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from derived_metrics import (
+    ALIGNED_COLUMNS,
+    DerivedMetric,
+    ESG_SCORE_COLUMN,
+    PERCENT_COLUMNS,
+    derive_metrics,
+    esg_grades,
+)
+
+
+def fund_frame(n_rows=1, **columns):
+    """Data prep columns read by the default spec, with columns overridden"""
+    df = pd.DataFrame({col: [0.1] * n_rows for col in PERCENT_COLUMNS})
+    for col in ALIGNED_COLUMNS:
+        df[col] = 12.0
+    df[ESG_SCORE_COLUMN] = 70.0
+    df["security_description"] = "FUND"
+    return df.assign(**columns)
+
+
+def test_esg_grades_band_edges():
+    scores = pd.Series([80.01, 80, 65.01, 65, 55.01, 55, 0, np.nan])
+    assert list(esg_grades(scores)) == ["A+", "A", "A", "A-", "A-", "B", "B", "B"]
+
+
+def test_derive_metrics_rounds_every_numeric_column():
+    df = fund_frame(**{"{{es_aligned}}": 1 / 3, "{{sust_invest}}": 0.12346})
+    df["total_capex_aligned"] = 12.3456
+    original = df.copy()
+
+    result = derive_metrics(df)
+
+    row = result.iloc[0]
+    assert row["{{es_aligned}}"] == 33.33
+    assert row["{{sust_invest}}"] == 12.35
+    assert row["{{other_nones}}"] == 66.67
+    assert row["{{other_non_sust}}"] == 20.99
+    assert row["rest_capex_aligned"] == 87.65
+    assert row[ESG_SCORE_COLUMN] == "A"
+    assert row["security_description"] == "FUND"
+    pd.testing.assert_frame_equal(df, original)
+
+
+def test_derive_metrics_grades_with_other_bands():
+    df = fund_frame(2, **{ESG_SCORE_COLUMN: [90.0, 40.0]})
+
+    result = derive_metrics(df, grade_bands=[(50, "pass")])
+
+    assert list(result[ESG_SCORE_COLUMN]) == ["pass", "B"]
+
+
+def test_derive_metrics_rejects_an_unknown_operation():
+    metrics = [DerivedMetric("x", "ratio", ("{{es_aligned}}",))]
+    with pytest.raises(ValueError, match="ratio"):
+        derive_metrics(fund_frame(), metrics)
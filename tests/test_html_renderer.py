@@ -0,0 +1,48 @@
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from html_renderer import render_table
+
+
+def soup_tbody(df):
+    """<tbody> of the former route: to_html, reparsed by BeautifulSoup"""
+    html_str = df.to_html(classes="dataframe", index=False, escape=False)
+    return str(BeautifulSoup(html_str, "html.parser").find("tbody"))
+
+
+def test_render_table_matches_to_html_for_plain_text():
+    df = pd.DataFrame(
+        {
+            "Largest investments": ["Bond A & Co", " Bond B ", "Yield > 5%"],
+            "Sector": ["Oil & Gas", None, "Energy"],
+            "% Assets": ["12.50%", "3.00%", float("nan")],
+        },
+        dtype=object,
+    )
+
+    html = render_table(df)
+
+    assert soup_tbody(df) in html
+    assert html.count('<col class="col') == 3
+    assert "<th>Largest investments</th><th>Sector</th><th>% Assets</th>" in html
+
+
+def test_render_table_escapes_text_and_headers():
+    df = pd.DataFrame({"R&D <note>": ["<b>bold</b>", "&amp;", "AT&T"]}, dtype=object)
+
+    table = BeautifulSoup(render_table(df), "html.parser")
+
+    assert table.th.get_text() == "R&D <note>"
+    assert [td.get_text() for td in table.find_all("td")] == df.iloc[:, 0].tolist()
+    assert table.find("b") is None
+
+
+def test_render_table_writes_markup_columns_as_given():
+    df = pd.DataFrame(
+        {"Name": ["<b>Fund</b>"], "Link": ['<a href="x.html">x</a>']}, dtype=object
+    )
+
+    table = BeautifulSoup(render_table(df, markup_columns={"Link"}), "html.parser")
+
+    assert table.find("b") is None
+    assert table.find("a")["href"] == "x.html"
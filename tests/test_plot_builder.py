@@ -0,0 +1,107 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import plot_builder
+
+
+def plot_row():
+    return pd.Series({col: 0.0 for col in plot_builder.PLOT_COLUMNS})
+
+
+def test_failed_render_leaves_no_temporary_file(tmp_path, monkeypatch):
+    def render_plot(row_data, plot_path, input_language):
+        with open(plot_path, "wb") as f:
+            f.write(b"half a plot")
+        raise RuntimeError("render failed")
+
+    monkeypatch.setattr(plot_builder, "render_plot", render_plot)
+    cache_dir = tmp_path / "cache"
+
+    with pytest.raises(RuntimeError):
+        plot_builder.build_plot(plot_row(), str(tmp_path), "en", str(cache_dir))
+
+    assert os.listdir(cache_dir) == []
+
+
+def test_eviction_deletes_stale_temporary_files(tmp_path):
+    stale = tmp_path / "abc.png.123.tmp"
+    fresh = tmp_path / "def.png.456.tmp"
+    stale.write_bytes(b"x")
+    fresh.write_bytes(b"x")
+    old = time.time() - plot_builder.STALE_TEMP_SECONDS - 60
+    os.utime(stale, (old, old))
+
+    plot_builder.evict_plot_cache(str(tmp_path))
+
+    assert sorted(os.listdir(tmp_path)) == [fresh.name]
+
+
+def test_eviction_keeps_the_most_recently_used_plots(tmp_path):
+    for i, name in enumerate(["old.png", "mid.png", "new.png"]):
+        (tmp_path / name).write_bytes(b"x" * 10)
+        os.utime(tmp_path / name, (1000 + i, 1000 + i))
+
+    plot_builder.evict_plot_cache(str(tmp_path), max_bytes=20)
+
+    assert sorted(os.listdir(tmp_path)) == ["mid.png", "new.png"]
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Replace the matplotlib render with one writing its inputs, and log calls"""
+    calls = []
+
+    def render_plot(row_data, plot_path, input_language):
+        calls.append(input_language)
+        with open(plot_path, "wb") as f:
+            f.write(f"{input_language} {row_data.sum()}".encode())
+
+    monkeypatch.setattr(plot_builder, "render_plot", render_plot)
+    return calls
+
+
+def test_plot_key_follows_the_plot_inputs():
+    row = plot_row()
+    assert plot_builder.plot_key(row, "en") == plot_builder.plot_key(row.copy(), "en")
+    assert plot_builder.plot_key(row, "en") != plot_builder.plot_key(row, "es")
+    changed = row.copy()
+    changed[plot_builder.PLOT_COLUMNS[0]] = 1.0
+    assert plot_builder.plot_key(row, "en") != plot_builder.plot_key(changed, "en")
+
+
+def test_cached_plot_is_copied_instead_of_rendered(tmp_path, renders):
+    cache_dir = str(tmp_path / "cache")
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+
+    name = plot_builder.build_plot(plot_row(), str(first), "en", cache_dir)
+    assert plot_builder.build_plot(plot_row(), str(second), "en", cache_dir) == name
+    assert renders == ["en"]
+    assert (second / name).read_bytes() == (first / name).read_bytes()
+
+    # Other inputs get a plot of their own; no cache renders every time
+    assert plot_builder.build_plot(plot_row(), str(first), "es", cache_dir) != name
+    plot_builder.build_plot(plot_row(), str(first), "en", None)
+    assert renders == ["en", "es", "en"]
+
+
+def test_cache_hit_keeps_a_plot_from_eviction(tmp_path, renders):
+    cache_dir = tmp_path / "cache"
+    for language in ("en", "es"):
+        plot_builder.build_plot(plot_row(), str(tmp_path), language, str(cache_dir))
+    for path in cache_dir.iterdir():
+        os.utime(path, (1000, 1000))
+
+    # Reusing the English plot makes it the most recently used one
+    plot_builder.build_plot(plot_row(), str(tmp_path), "en", str(cache_dir))
+    en_key = plot_builder.plot_key(plot_row(), "en")
+    plot_builder.evict_plot_cache(
+        str(cache_dir), max_bytes=(cache_dir / f"{en_key}.png").stat().st_size
+    )
+
+    assert os.listdir(cache_dir) == [f"{en_key}.png"]
+    assert renders == ["en", "es"]
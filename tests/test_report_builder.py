@@ -0,0 +1,102 @@
+import importlib
+
+import pandas as pd
+
+import plot_builder
+from processed_data_store import save_table_records
+
+report_builder = importlib.import_module("02_report_builder")
+
+TEMPLATE = (
+    '<html><body><div id="q03_t1"></div><div id="q04_t"></div>'
+    '<div class="chart"><img src=""/></div></body></html>'
+)
+
+# Columns read by render_report besides narrative and tables_file
+REPORT_COLUMNS = [
+    "{{product_name}}",
+    "{{lei_code}}",
+    "{{sust_invest}}",
+    "{{esg_score_2022}}",
+    "{{esg_score_2023}}",
+    "{{esg_score_2024}}",
+    "{{es_aligned}}",
+    "{{sust_invest_env}}",
+    "{{sust_invest_soc}}",
+    "{{other_nones}}",
+    "{{ref_period}}",
+    "{{other_non_sust}}",
+    "{{taxonomy_2022}}",
+    "{{taxonomy_2023}}",
+] + [
+    f"total_{kpi}_{part}"
+    for kpi in ("turnover", "capex", "opex")
+    for part in ("enabling", "transition", "aligned", "nuclear", "gas")
+]
+
+
+def save_fund_tables(data_dir):
+    """Save the side file of one fund under data_dir, as data prep does"""
+    tables_dir = data_dir / "20240101_final_processed_data_tables"
+    tables_dir.mkdir(parents=True)
+    save_table_records(
+        {
+            "q03_t1": pd.DataFrame(
+                {
+                    "Largest investments": ["Bond A"],
+                    "Sector": ["Energy"],
+                    "% Assets": ["12.50%"],
+                    "Country": ["Spain"],
+                },
+                dtype=object,
+            ),
+            "q04_t": pd.DataFrame(
+                {"Sector": ["Energy"], "% Assets": ["12.5%"]}, dtype=object
+            ),
+        },
+        tables_dir / "FUND1.json",
+    )
+    return f"{tables_dir.name}/FUND1.json"
+
+
+def test_render_tables_reads_the_given_data_folder(tmp_path):
+    tables_file = save_fund_tables(tmp_path / "data")
+
+    investment_table, sector_table = report_builder.render_tables(
+        tables_file, "en", data_dir=tmp_path / "data"
+    )
+
+    assert "Bond A" in investment_table
+    assert "12.50%" in investment_table
+    assert "Energy" in sector_table
+
+
+def test_build_reports_reads_tables_next_to_the_data(tmp_path, monkeypatch):
+    data_dir = tmp_path / "elsewhere" / "final_processed_data"
+    tables_file = save_fund_tables(data_dir)
+    template_dir = tmp_path / "templates"
+    template_dir.mkdir()
+    (template_dir / "nar_narrative_template_en.html").write_text(TEMPLATE)
+    output_dir = tmp_path / "reports"
+
+    monkeypatch.setattr(report_builder, "template_dir", str(template_dir))
+    monkeypatch.setattr(report_builder, "output_dir", str(output_dir))
+    monkeypatch.setattr(report_builder, "plots_dir", str(output_dir / "plots"))
+    monkeypatch.setattr(plot_builder, "build_plot", lambda *args: "plot.png")
+    report_builder.report_environment.cache_clear()
+
+    row = {col: 0.0 for col in REPORT_COLUMNS}
+    row.update(
+        {"{{product_name}}": "Fund 1", "narrative": "nar", "tables_file": tables_file}
+    )
+    df = pd.DataFrame([row])
+
+    try:
+        filenames = report_builder.build_reports(df, "en", data_dir=data_dir)
+    finally:
+        report_builder.report_environment.cache_clear()
+
+    assert len(filenames) == 1
+    report = (output_dir / filenames[0]).read_text(encoding="utf-8")
+    assert "Bond A" in report
+    assert "plots/plot.png" in report
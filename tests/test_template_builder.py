@@ -0,0 +1,98 @@
+import importlib
+import json
+import os
+
+import pandas as pd
+import pytest
+
+template_builder = importlib.import_module("01_template_builder")
+
+TEMPLATE = '<html><body><h1 id="main_heading_text"></h1><p id="product_name"></p></body></html>'
+
+
+@pytest.fixture
+def narratives(tmp_path, monkeypatch):
+    """Point the builder at a narratives workbook and template under tmp_path"""
+    monkeypatch.setattr(template_builder, "excel_file", str(tmp_path / "book.xlsx"))
+    monkeypatch.setattr(
+        template_builder, "template_file", str(tmp_path / "template.html")
+    )
+    monkeypatch.setattr(template_builder, "output_dir", str(tmp_path / "templates"))
+    (tmp_path / "template.html").write_text(TEMPLATE, encoding="utf-8")
+    return tmp_path
+
+
+def write_sheet(folder, products):
+    """Save the 'en' sheet with one row per narrative and product name"""
+    df = pd.DataFrame(
+        {
+            "narrative": list(products),
+            "main_heading_text": "Periodic disclosure",
+            "product_name": list(products.values()),
+        }
+    )
+    df.to_excel(folder / "book.xlsx", sheet_name="en", index=False)
+
+
+def build(capsys):
+    """Build the 'en' templates and return the summary line printed"""
+    template_builder.build_all_templates(["en"])
+    return capsys.readouterr().out.splitlines()[-2]
+
+
+def template_path(folder, narrative):
+    return folder / "templates" / f"{narrative}_narrative_template_en.html"
+
+
+def test_only_new_and_changed_templates_are_written(narratives, capsys):
+    write_sheet(narratives, {"art8": "Fund A", "art9": "Fund B"})
+    assert build(capsys) == (
+        "Templates: 2 new, 0 changed, 0 forced, 0 unchanged, 0 removed"
+    )
+    assert "Fund A" in template_path(narratives, "art8").read_text(encoding="utf-8")
+
+    # Unchanged inputs leave the files untouched
+    for narrative in ("art8", "art9"):
+        os.utime(template_path(narratives, narrative), (1000, 1000))
+    assert build(capsys) == (
+        "Templates: 0 new, 0 changed, 0 forced, 2 unchanged, 0 removed"
+    )
+    assert os.path.getmtime(template_path(narratives, "art8")) == 1000
+
+    # An edited row, a new row and a row taken out of the sheet
+    write_sheet(narratives, {"art8": "Fund A2", "art6": "Fund C"})
+    assert build(capsys) == (
+        "Templates: 1 new, 1 changed, 0 forced, 0 unchanged, 1 removed"
+    )
+    assert "Fund A2" in template_path(narratives, "art8").read_text(encoding="utf-8")
+    assert template_path(narratives, "art6").exists()
+
+    # The removed template is left on disk but no longer tracked
+    assert os.path.getmtime(template_path(narratives, "art9")) == 1000
+    manifest_path = narratives / "templates" / template_builder.TEMPLATE_MANIFEST_FILE
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert sorted(manifest["templates"]) == [
+        "art6_narrative_template_en.html",
+        "art8_narrative_template_en.html",
+    ]
+
+
+def test_template_and_missing_files_are_rebuilt(narratives, capsys):
+    write_sheet(narratives, {"art8": "Fund A", "art9": "Fund B"})
+    build(capsys)
+
+    template_path(narratives, "art9").unlink()
+    assert build(capsys) == (
+        "Templates: 1 new, 0 changed, 0 forced, 1 unchanged, 0 removed"
+    )
+
+    (narratives / "template.html").write_text(
+        TEMPLATE.replace("<h1", '<h1 class="title"'), encoding="utf-8"
+    )
+    assert build(capsys) == (
+        "Templates: 0 new, 2 changed, 0 forced, 0 unchanged, 0 removed"
+    )
+    assert 'class="title"' in template_path(narratives, "art9").read_text(
+        encoding="utf-8"
+    )